@@ -0,0 +1,369 @@
+import importlib.util
+import os
+import pathlib
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import closing, contextmanager
+
+import pandas as pd
+
+import perf
+from data_loader import load_months
+from month_registry import store_state_path
+
+# Per-process state (aggregate database, figure caches, ...) lives here.
+STATE_DIR = '.dashboard'
+
+# Engine the store's queries run on: 'sqlite' queries the database itself;
+# 'duckdb' runs them on an in-memory columnar copy of the summary tables,
+# refreshed whenever the database changes; 'auto' uses duckdb when installed.
+SQL_BACKEND = os.environ.get('DASHBOARD_SQL_BACKEND', 'sqlite')
+
+# Limits of the read-only queries run through sql(): seconds before a query
+# is interrupted, and rows returned at most.
+SQL_TIMEOUT = float(os.environ.get('DASHBOARD_SQL_TIMEOUT', '5'))
+SQL_MAX_ROWS = int(os.environ.get('DASHBOARD_SQL_MAX_ROWS', '10000'))
+
+# File kinds summarised by the store, i.e. what the ALL view needs.
+AGGREGATE_KINDS = ('kpi', 'items', 'purchasing_gap', 'payment_method')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sources (
+    month TEXT NOT NULL, kind TEXT NOT NULL, path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL,
+    PRIMARY KEY (month, kind));
+CREATE TABLE IF NOT EXISTS month_kpis (
+    month TEXT NOT NULL, kpi TEXT NOT NULL, value REAL,
+    PRIMARY KEY (month, kpi));
+CREATE TABLE IF NOT EXISTS month_products (
+    month TEXT NOT NULL, product TEXT NOT NULL, quantity NUMERIC NOT NULL,
+    PRIMARY KEY (month, product));
+CREATE TABLE IF NOT EXISTS month_gaps (
+    month TEXT NOT NULL, bucket TEXT NOT NULL, percentage REAL,
+    PRIMARY KEY (month, bucket));
+CREATE TABLE IF NOT EXISTS month_payments (
+    month TEXT NOT NULL, method TEXT NOT NULL, orders INTEGER NOT NULL,
+    PRIMARY KEY (month, method));
+CREATE TABLE IF NOT EXISTS months (
+    month TEXT PRIMARY KEY, position INTEGER NOT NULL);
+'''
+
+# Tables open to queries (and copied to DuckDB): the summaries, plus months
+# with each month's chronological position.
+QUERY_TABLES = ('months', 'month_kpis', 'month_products', 'month_gaps', 'month_payments')
+_READ_ONLY_RE = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+
+# Summary table written from each file kind.
+_KIND_TABLES = {
+    'kpi': 'month_kpis',
+    'items': 'month_products',
+    'purchasing_gap': 'month_gaps',
+    'payment_method': 'month_payments',
+}
+
+
+def _kpi_rows(month, df):
+    names = df['KPI'].astype(str).str.lower().str.strip()
+    values = pd.to_numeric(df['Value'], errors='coerce')
+    summary = pd.DataFrame({'kpi': names, 'value': values}).drop_duplicates('kpi', keep='first')
+    return [(month, kpi, None if pd.isna(value) else value)
+            for kpi, value in zip(summary['kpi'], summary['value'].tolist())]
+
+
+def _product_rows(month, df):
+    grouped = df.groupby(df['Product'].astype(str))['Quantity'].sum()
+    return [(month, product, quantity) for product, quantity in zip(grouped.index, grouped.tolist())]
+
+
+def _gap_rows(month, df):
+    if 'Purchasing Gap' not in df.columns or 'Percentage' not in df.columns:
+        return []
+    df = df.drop_duplicates('Purchasing Gap', keep='first')
+    return [(month, str(bucket), None if pd.isna(pct) else pct)
+            for bucket, pct in zip(df['Purchasing Gap'], df['Percentage'].tolist())]
+
+
+def _payment_rows(month, df):
+    df = df.drop_duplicates('Day', keep='first')
+    return [(month, method, int(df[method].sum())) for method in df.columns if method != 'Day']
+
+
+_SUMMARISERS = {
+    'kpi': _kpi_rows,
+    'items': _product_rows,
+    'purchasing_gap': _gap_rows,
+    'payment_method': _payment_rows,
+}
+
+
+def _has_duckdb():
+    # duckdb is optional and only imported once a store uses it
+    return importlib.util.find_spec('duckdb') is not None
+
+
+def resolve_backend(backend=None):
+    """'sqlite' or 'duckdb' for backend (default SQL_BACKEND)."""
+    backend = (backend or SQL_BACKEND).strip().lower()
+    if backend == 'auto':
+        return 'duckdb' if _has_duckdb() else 'sqlite'
+    if backend not in ('sqlite', 'duckdb'):
+        raise ValueError(f'Unknown SQL backend {backend!r}; use auto, sqlite or duckdb')
+    if backend == 'duckdb' and not _has_duckdb():
+        raise ImportError('The duckdb SQL backend needs the duckdb package')
+    return backend
+
+
+class AggregateStore:
+    """SQLite store of per-month aggregates for the ALL view.
+    Each (month, file kind) is stamped with its source file's mtime and size;
+    sync() re-summarises only the files whose stamp changed, so reading the
+    summary costs the same regardless of how large the raw files are. Queries
+    run on backend ('sqlite' or 'duckdb', see SQL_BACKEND)."""
+
+    def __init__(self, db_path, backend=None):
+        self.db_path = db_path
+        self.backend = resolve_backend(backend)
+        self._lock = threading.Lock()
+        self._duck_lock = threading.Lock()
+        self._duck = None
+        self._duck_stamp = None
+        self._duck_users = Counter()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self, read_only=False):
+        if read_only:
+            return sqlite3.connect(f'{pathlib.Path(os.path.abspath(self.db_path)).as_uri()}?mode=ro',
+                                   uri=True, timeout=30)
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    @contextmanager
+    def _duckdb(self):
+        """Cursor on the DuckDB copy of QUERY_TABLES, copied again when the
+        database file has changed since the last copy. A replaced copy is
+        closed once its last cursor is done."""
+        import duckdb
+
+        stat = os.stat(self.db_path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._duck_lock:
+            if self._duck is None or self._duck_stamp != stamp:
+                conn = duckdb.connect()
+                with closing(self._connect(read_only=True)) as source:
+                    for table in QUERY_TABLES:
+                        frame = pd.read_sql_query(f'SELECT * FROM {table} ORDER BY rowid', source)
+                        conn.register('source_frame', frame)
+                        conn.execute(f'CREATE TABLE {table} AS SELECT * FROM source_frame')
+                        conn.unregister('source_frame')
+                # Queries may read these tables only, not files or URLs
+                conn.execute('SET enable_external_access = false')
+                if self._duck is not None and not self._duck_users[self._duck]:
+                    self._duck.close()
+                self._duck, self._duck_stamp = conn, stamp
+            conn = self._duck
+            self._duck_users[conn] += 1
+        try:
+            with closing(conn.cursor()) as cursor:
+                yield cursor
+        finally:
+            with self._duck_lock:
+                self._duck_users[conn] -= 1
+                if not self._duck_users[conn]:
+                    del self._duck_users[conn]
+                    if conn is not self._duck:
+                        conn.close()
+
+    def _query(self, sql, params=(), read_only=False, timeout=None):
+        """DataFrame of sql; with a timeout (seconds), a query still running
+        then is interrupted and raises TimeoutError."""
+        with perf.timer('transform', 'aggregate_query', backend=self.backend) as event:
+            if self.backend == 'duckdb':
+                import duckdb
+
+                with self._duckdb() as cursor:
+                    # Unlike sqlite3, DuckDB runs every statement it is given
+                    if read_only and [stmt.type for stmt in cursor.extract_statements(sql)] != [
+                            duckdb.StatementType.SELECT]:
+                        raise ValueError('Only a single SELECT query can be run')
+                    timer = threading.Timer(timeout, cursor.interrupt) if timeout else None
+                    if timer:
+                        timer.start()
+                    try:
+                        result = cursor.execute(sql, list(params))
+                        types = [(name, str(type_code)) for name, type_code, *_ in result.description]
+                        df = result.df()
+                    except duckdb.InterruptException:
+                        raise TimeoutError(f'Query took longer than {timeout:g}s') from None
+                    finally:
+                        if timer:
+                            timer.cancel()
+                # DuckDB sums integers as HUGEINT, which arrives as float;
+                # SQLite returns integer sums as int
+                for name, type_code in types:
+                    if type_code == 'HUGEINT' and df[name].notna().all():
+                        df[name] = df[name].astype('int64')
+            else:
+                with closing(self._connect(read_only)) as conn:
+                    if timeout:
+                        deadline = time.monotonic() + timeout
+                        # Called every 10000 SQLite instructions; non-zero aborts
+                        conn.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+                    try:
+                        df = pd.read_sql_query(sql, conn, params=params)
+                    except (sqlite3.OperationalError, pd.errors.DatabaseError) as e:
+                        if timeout and 'interrupted' in str(e):
+                            raise TimeoutError(f'Query took longer than {timeout:g}s') from None
+                        raise
+            event['rows'] = len(df)
+        return df
+
+    def sql(self, query, params=(), timeout=None, max_rows=None):
+        """Run a read-only SELECT (or WITH) query over QUERY_TABLES on the
+        store's backend, for at most timeout seconds (default SQL_TIMEOUT)
+        and returning at most max_rows rows (default SQL_MAX_ROWS). Months
+        are folder names; join months and order by position for
+        chronological order."""
+        if not _READ_ONLY_RE.match(query):
+            raise ValueError('Only SELECT queries can be run')
+        max_rows = SQL_MAX_ROWS if max_rows is None else max_rows
+        limited = f'SELECT * FROM ({query.strip().rstrip(";")}\n) AS query LIMIT {int(max_rows)}'
+        return self._query(limited, params, read_only=True, timeout=timeout or SQL_TIMEOUT)
+
+    def sync(self, month_files):
+        """Bring the store in line with month_files ({month: {kind: path}}).
+        Returns the LoadErrors of files that could not be summarised; those
+        stay unstamped and are retried on the next sync."""
+        with self._lock, closing(self._connect()) as conn:
+            stored = {(month, kind): (path, mtime_ns, size) for month, kind, path, mtime_ns, size
+                      in conn.execute('SELECT month, kind, path, mtime_ns, size FROM sources')}
+            stale = {}
+            removed = [key for key in stored if key[0] not in month_files]
+            for month, files in month_files.items():
+                for kind in AGGREGATE_KINDS:
+                    path = files.get(kind)
+                    if path is None:
+                        if (month, kind) in stored:
+                            removed.append((month, kind))
+                        continue
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        removed.append((month, kind))
+                        continue
+                    stamp = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+                    if stored.get((month, kind)) != stamp:
+                        stale.setdefault(month, {})[kind] = (path, stamp)
+
+            data, errors = load_months({month: {kind: path for kind, (path, _) in kinds.items()}
+                                        for month, kinds in stale.items()}, AGGREGATE_KINDS)
+            perf.count('aggregate_files_synced', sum(len(kinds) for kinds in stale.values()))
+            failed = {(err.month, err.kind) for err in errors}
+            positions = [month for month, in conn.execute('SELECT month FROM months ORDER BY position')]
+            with conn:
+                if positions != list(month_files):
+                    conn.execute('DELETE FROM months')
+                    conn.executemany('INSERT INTO months VALUES (?, ?)',
+                                     [(month, idx) for idx, month in enumerate(month_files)])
+                for month, kind in removed:
+                    conn.execute(f'DELETE FROM {_KIND_TABLES[kind]} WHERE month = ?', (month,))
+                    conn.execute('DELETE FROM sources WHERE month = ? AND kind = ?', (month, kind))
+                for month, kinds in stale.items():
+                    for kind, (path, stamp) in kinds.items():
+                        if (month, kind) in failed:
+                            continue
+                        df = data[month].get(kind)
+                        rows = _SUMMARISERS[kind](month, df) if df is not None else []
+                        table = _KIND_TABLES[kind]
+                        conn.execute(f'DELETE FROM {table} WHERE month = ?', (month,))
+                        conn.executemany(f'INSERT INTO {table} VALUES (?, ?, ?)', rows)
+                        conn.execute('INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?)',
+                                     (month, kind) + stamp)
+        return errors
+
+    def invalidate(self, month, kind):
+        """Forget the stamp of one month's file kind, so the next sync
+        re-summarises it even if the file looks unchanged."""
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM sources WHERE month = ? AND kind = ?', (month, kind))
+
+    @staticmethod
+    def _in_months(months):
+        return ', '.join('?' * len(months))
+
+    def kpi_by_month(self, kpi, months):
+        """Value of one KPI (matched case-insensitively) per month, in the
+        order of months. Months without it are left out."""
+        if not months:
+            return pd.DataFrame(columns=['Month', 'Value'])
+        df = self._query(f'SELECT month AS Month, value AS Value FROM month_kpis '
+                         f'WHERE kpi = ? AND value IS NOT NULL AND month IN ({self._in_months(months)})',
+                         [kpi.lower().strip()] + list(months))
+        order = {month: idx for idx, month in enumerate(months)}
+        return df.sort_values('Month', key=lambda col: col.map(order)).reset_index(drop=True)
+
+    def top_products(self, months, limit=10):
+        """Products with the highest combined quantity across months; every
+        product when limit is None."""
+        if not months:
+            return pd.DataFrame(columns=['Product', 'Quantity'])
+        sql = (f'SELECT product AS Product, SUM(quantity) AS Quantity FROM month_products '
+               f'WHERE month IN ({self._in_months(months)}) '
+               f'GROUP BY product ORDER BY Quantity DESC, product')
+        if limit is None:
+            return self._query(sql, list(months))
+        return self._query(f'{sql} LIMIT ?', list(months) + [limit])
+
+    def purchasing_gap_sums(self, months):
+        """Sum and count of the percentages per purchasing gap bucket across
+        months, for combining means over several stores."""
+        if not months:
+            return pd.DataFrame(columns=['Purchasing Gap', 'Sum', 'Count'])
+        return self._query(f'SELECT bucket AS "Purchasing Gap", SUM(percentage) AS "Sum", '
+                           f'COUNT(percentage) AS "Count" FROM month_gaps '
+                           f'WHERE month IN ({self._in_months(months)}) GROUP BY bucket',
+                           list(months))
+
+    def purchasing_gap(self, months):
+        """Mean percentage per purchasing gap bucket across months."""
+        if not months:
+            return pd.DataFrame(columns=['Purchasing Gap', 'Percentage'])
+        return self._query(f'SELECT bucket AS "Purchasing Gap", AVG(percentage) AS Percentage FROM month_gaps '
+                           f'WHERE month IN ({self._in_months(months)}) GROUP BY bucket',
+                           list(months))
+
+    def payment_totals(self, months):
+        """Orders per payment method, one row per month with one column per
+        method, in the order of months."""
+        if not months:
+            return pd.DataFrame(columns=['Month'])
+        df = self._query(f'SELECT month, method, orders FROM month_payments '
+                         f'WHERE month IN ({self._in_months(months)}) ORDER BY rowid', list(months))
+        if df.empty:
+            return pd.DataFrame(columns=['Month'])
+        wide = df.pivot(index='month', columns='method', values='orders')
+        wide = wide[list(dict.fromkeys(df['method']))].fillna(0).astype('int64')
+        wide = wide.reindex([month for month in months if month in wide.index])
+        return wide.rename_axis(index='Month', columns=None).reset_index()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(base_path):
+    """Process-wide aggregate store for base_path. The database lives in
+    base_path/.dashboard/ unless DASHBOARD_AGGREGATES_DB points elsewhere
+    (one file per store in the multi-store layout); queries run on
+    SQL_BACKEND."""
+    if os.environ.get('DASHBOARD_AGGREGATES_DB'):
+        db_path = store_state_path(os.environ['DASHBOARD_AGGREGATES_DB'], base_path)
+    else:
+        db_path = os.path.abspath(os.path.join(base_path, STATE_DIR, 'aggregates.sqlite'))
+    with _stores_lock:
+        if db_path not in _stores:
+            _stores[db_path] = AggregateStore(db_path)
+        return _stores[db_path]
@@ -0,0 +1,184 @@
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# Stages are timed on the parsers themselves, not on cached or sidecar reads.
+os.environ['DASHBOARD_SIDECARS'] = '0'
+
+import pandas as pd
+
+from aggregate_store import AggregateStore
+from charts import (daily_figure, monthly_orders_figure, payment_totals_figure, payment_trend_figure,
+                    purchasing_gap_figure, top_products, top_products_figure)
+from data_loader import LOADERS, parse_payment_file, read_items_file
+from excel_engine import read_excel, resolve_engine
+from month_registry import MonthRegistry
+from synthetic_data import DEFAULTS, parse_options, write_dataset
+from timeseries import DAILY_METRICS, daily_frame
+
+# Usage: python bench_dashboard.py [--months=N] [--days=N] [--products=N] [--header-rows=N]
+#                                  [--repeat=N] [--output=PATH] [--data=DIR] [--compare=PATH]
+#                                  [--tolerance=X]
+# Generates a synthetic dataset (see synthetic_data.py), times each stage of
+# the dashboard's load/parse/render path separately and writes the results
+# as JSON. With --compare, stages slower than the previous results file by
+# more than --tolerance (a ratio, default 1.25) fail the run.
+
+SHEET_KINDS = ('kpi', 'abv', 'orders', 'turnover', 'purchasing_gap')
+
+
+def stage_discovery(ctx):
+    registry = MonthRegistry(ctx['base_path'])
+    registry.refresh(force=True)
+    return sum(len(entry.files) for entry in map(registry.month, registry.months()))
+
+
+def stage_xlsx_read(ctx):
+    count = 0
+    for files in ctx['files'].values():
+        for kind in SHEET_KINDS:
+            read_excel(files[kind])
+            count += 1
+    return count
+
+
+def stage_payment_parse(ctx):
+    return sum(len(parse_payment_file(files['payment_method'])) for files in ctx['files'].values())
+
+
+def stage_items_header(ctx):
+    return sum(len(read_items_file(files['items'])) for files in ctx['files'].values())
+
+
+def stage_aggregation(ctx):
+    months = list(ctx['files'])
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AggregateStore(os.path.join(tmp, 'aggregates.sqlite'))
+        store.sync(ctx['files'])
+        store.kpi_by_month('Total Orders', months)
+        store.top_products(months)
+        store.purchasing_gap(months)
+        store.payment_totals(months)
+    for files in ctx['files'].values():
+        daily_frame(files)
+        top_products(LOADERS['items'](files['items']))
+    return len(months)
+
+
+def stage_figures(ctx):
+    months = list(ctx['files'])
+    figures = []
+    for files in ctx['files'].values():
+        daily, _ = daily_frame(files)
+        for column in DAILY_METRICS.values():
+            figures.append(daily_figure(daily, column, column))
+        figures.append(top_products_figure(top_products(LOADERS['items'](files['items']))))
+        figures.append(purchasing_gap_figure(LOADERS['purchasing_gap'](files['purchasing_gap'])))
+        figures.append(payment_trend_figure(LOADERS['payment_method'](files['payment_method'])))
+    store = ctx['store']
+    figures.append(monthly_orders_figure(
+        store.kpi_by_month('Total Orders', months).rename(columns={'Value': 'Total Orders'})))
+    figures.append(top_products_figure(store.top_products(months), '#9B59B6', 'Total Quantity'))
+    figures.append(purchasing_gap_figure(store.purchasing_gap(months)))
+    figures.append(payment_totals_figure(store.payment_totals(months)))
+    for fig in figures:
+        fig.to_json()
+    return len(figures)
+
+
+STAGES = {
+    'discovery': stage_discovery,
+    'xlsx_read': stage_xlsx_read,
+    'payment_parse': stage_payment_parse,
+    'items_header': stage_items_header,
+    'aggregation': stage_aggregation,
+    'figures': stage_figures,
+}
+
+
+def time_stage(func, ctx, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = func(ctx)
+        times.append(time.perf_counter() - start)
+    return {'best_s': min(times), 'mean_s': sum(times) / len(times), 'repeat': repeat, 'items': items}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(base_path, config, repeat=3):
+    """Generate the dataset into base_path and time every stage."""
+    write_dataset(base_path, **config)
+    registry = MonthRegistry(base_path)
+    files = registry.manifest()
+    ctx = {'base_path': base_path, 'files': files}
+    # Warm the loader cache and a store, which the later stages read from.
+    ctx['store'] = AggregateStore(os.path.join(base_path, '.bench.sqlite'))
+    ctx['store'].sync(files)
+    stages = {}
+    for name, func in STAGES.items():
+        stages[name] = time_stage(func, ctx, repeat)
+        print(f"{name:<15} {stages[name]['best_s'] * 1000:9.1f}ms best  "
+              f"{stages[name]['mean_s'] * 1000:9.1f}ms mean  {stages[name]['items']:>7} items")
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'excel_engine': resolve_engine(),
+        'platform': platform.platform(),
+        'config': config,
+        'stages': stages,
+    }
+
+
+def compare(results, previous, tolerance):
+    """Print the ratio of each stage to previous results; return the names
+    of stages slower than tolerance."""
+    slower = []
+    for name, stage in results['stages'].items():
+        old = previous.get('stages', {}).get(name)
+        if not old:
+            continue
+        ratio = stage['best_s'] / old['best_s'] if old['best_s'] else float('inf')
+        flag = ''
+        if ratio > tolerance:
+            slower.append(name)
+            flag = '  SLOWER'
+        print(f'{name:<15} x{ratio:5.2f} vs {previous.get("commit") or "previous"}{flag}')
+    return slower
+
+
+if __name__ == '__main__':
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    config = dict(DEFAULTS, **parse_options(sys.argv[1:]))
+    repeat = int(options.get('repeat', 3))
+    output = options.get('output', 'bench_results.json')
+    data_dir = options.get('data')
+    base_path = data_dir or tempfile.mkdtemp(prefix='dashboard-bench-')
+    try:
+        results = run(base_path, config, repeat)
+    finally:
+        if not data_dir:
+            shutil.rmtree(base_path, ignore_errors=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results written to {output}')
+    if 'compare' in options:
+        with open(options['compare']) as f:
+            previous = json.load(f)
+        if compare(results, previous, float(options.get('tolerance', 1.25))):
+            sys.exit(1)
@@ -0,0 +1,120 @@
+import glob
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_loader import PAYMENT_METHODS, parse_payment_grid
+from synthetic_data import month_periods, payment_grid_rows
+
+# Usage: python bench_payment.py [YEARS ...]
+# Compares the vectorized calendar-grid parser with the original row-by-row
+# implementation on the bundled payment_method files and on synthetic grids
+# holding several years of calendar pages stacked vertically.
+
+
+def legacy_parse(raw):
+    """The original row-by-row parser, kept as the reference implementation."""
+    records = []
+    for row_idx in range(len(raw)):
+        row = raw.iloc[row_idx]
+        day_cells = {}
+        for col_idx, val in enumerate(row):
+            try:
+                day = int(float(val))
+                if 1 <= day <= 31:
+                    day_cells[col_idx] = day
+            except (ValueError, TypeError):
+                pass
+        if not day_cells:
+            continue
+        cod_row = instamojo_row = None
+        combined_row = None
+        for offset in range(1, 5):
+            if row_idx + offset >= len(raw):
+                break
+            candidate = raw.iloc[row_idx + offset]
+            for c_val in candidate:
+                c_str = str(c_val).lower()
+                if 'cod:' in c_str and 'instamojo:' in c_str:
+                    combined_row = candidate
+                    break
+            if combined_row is not None:
+                break
+            cand_str = candidate.astype(str).str.lower()
+            if cand_str.str.contains('cod:').any() and cod_row is None:
+                cod_row = candidate
+            if cand_str.str.contains('instamojo:').any() and instamojo_row is None:
+                instamojo_row = candidate
+        if cod_row is None and instamojo_row is None and combined_row is None:
+            continue
+        for col_idx, day in day_cells.items():
+            cod_val = 0
+            insta_val = 0
+            if combined_row is not None:
+                cell = str(combined_row.iloc[col_idx])
+                cod_match = re.search(r'cod:\s*(\d+)', cell, re.IGNORECASE)
+                insta_match = re.search(r'instamojo:\s*(\d+)', cell, re.IGNORECASE)
+                if cod_match:
+                    cod_val = int(cod_match.group(1))
+                if insta_match:
+                    insta_val = int(insta_match.group(1))
+            else:
+                if cod_row is not None:
+                    cell = str(cod_row.iloc[col_idx])
+                    m = re.search(r'cod:\s*(\d+)', cell, re.IGNORECASE)
+                    if m:
+                        cod_val = int(m.group(1))
+                if instamojo_row is not None:
+                    cell = str(instamojo_row.iloc[col_idx])
+                    m = re.search(r'instamojo:\s*(\d+)', cell, re.IGNORECASE)
+                    if m:
+                        insta_val = int(m.group(1))
+            records.append({'Day': day, 'COD': cod_val, 'Instamojo': insta_val})
+    return records
+
+
+def synthetic_grid(years, start_year=2020, combined_every=3, seed=0):
+    """Stack years of synthetic_data calendar pages into one header-less
+    grid. Every combined_every-th month puts all counts in a single cell
+    instead of one row per method."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for idx, period in enumerate(month_periods(years * 12, start_year)):
+        rows += payment_grid_rows(period, rng, combined=bool(combined_every) and idx % combined_every == 0)
+    return pd.DataFrame(rows, dtype=object)
+
+
+def timed(func, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def check(name, raw):
+    expected, legacy_time = timed(legacy_parse, raw)
+    # The default call, which detects the methods in the grid
+    actual, fast_time = timed(parse_payment_grid, raw)
+    expected = pd.DataFrame(expected, columns=['Day'] + list(PAYMENT_METHODS))
+    same = expected.astype('int64').equals(actual.astype('int64'))
+    print(f'{name:<40} {raw.shape[0]:>7} rows {len(actual):>6} days  '
+          f'legacy {legacy_time * 1000:9.1f}ms  vectorized {fast_time * 1000:7.1f}ms  '
+          f'x{legacy_time / fast_time:6.1f}  {"identical" if same else "MISMATCH"}')
+    return same
+
+
+if __name__ == '__main__':
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    years = [int(arg) for arg in sys.argv[1:]] or [1, 3, 10]
+    ok = True
+    for path in sorted(glob.glob(os.path.join(base_path, '*', '*payment_method*.xlsx'))):
+        ok &= check(os.path.relpath(path, base_path), pd.read_excel(path, header=None))
+    for n in years:
+        ok &= check(f'synthetic {n} year(s)', synthetic_grid(n))
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,186 @@
+import os
+
+import pandas as pd
+
+from downsample import downsample
+from timeseries import month_bounds
+
+# plotly is imported by the builders themselves, so importing this module
+# (and the app) does not pay for plotly.express until a chart is built on a
+# figure cache miss.
+
+MONTH_COLORS = ['#FF6B6B', '#4ECDC4', '#45B7D1']
+# (line, fill) colours per payment method; other methods use Plotly defaults
+PAYMENT_COLORS = {
+    'COD': ('#FF6B6B', 'rgba(255, 107, 107, 0.4)'),
+    'Instamojo': ('#4ECDC4', 'rgba(78, 205, 196, 0.4)'),
+}
+
+# Trend charts switch to WebGL traces above this many points per trace...
+WEBGL_POINT_THRESHOLD = int(os.environ.get('DASHBOARD_WEBGL_THRESHOLD', '1000'))
+# ...and are downsampled to at most this many (about two per pixel of a
+# full-width chart), so the payload stays flat as history grows.
+MAX_PLOT_POINTS = int(os.environ.get('DASHBOARD_MAX_PLOT_POINTS', '2000'))
+# 'lttb' or 'minmax', see downsample.py
+DOWNSAMPLE_METHOD = os.environ.get('DASHBOARD_DOWNSAMPLE', 'lttb')
+
+
+def reduce_points(df, x, y_columns):
+    """Rows of df to plot: all of them up to MAX_PLOT_POINTS, otherwise a
+    downsampled subset chosen on the total of y_columns so that stacked
+    traces keep a shared x."""
+    if len(df) <= MAX_PLOT_POINTS:
+        return df
+    total = df[list(y_columns)].sum(axis=1)
+    return df.iloc[downsample(df[x], total, MAX_PLOT_POINTS, DOWNSAMPLE_METHOD)]
+
+
+def monthly_orders_figure(orders_df):
+    """Bar + trend line of total orders per month (Month, Total Orders)."""
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(specs=[[{'secondary_y': False}]])
+    fig.add_trace(go.Bar(x=orders_df['Month'], y=orders_df['Total Orders'], name='Total Orders',
+                        marker_color=[MONTH_COLORS[i % len(MONTH_COLORS)] for i in range(len(orders_df))],
+                        text=orders_df['Total Orders'],
+                        textposition='outside', texttemplate='%{text:.0f}'))
+    fig.add_trace(go.Scatter(x=orders_df['Month'], y=orders_df['Total Orders'], name='Trend',
+                            mode='lines+markers', line=dict(color='#2C3E50', width=3),
+                            marker=dict(size=10, color='#E74C3C')))
+    fig.update_layout(xaxis_title='Month', yaxis_title='Total Orders', showlegend=True, height=500, hovermode='x unified')
+    return fig
+
+
+def top_products(items_df, n=10):
+    """The n products with the highest total quantity."""
+    items_grouped = items_df.groupby('Product', as_index=False)['Quantity'].sum()
+    return items_grouped.sort_values(by='Quantity', ascending=False).head(n)
+
+
+def top_products_figure(top_df, color='#3366CC', quantity_label='Quantity'):
+    """Horizontal bar chart of a Product/Quantity frame."""
+    import plotly.express as px
+
+    fig = px.bar(top_df, x='Quantity', y='Product', orientation='h',
+                 labels={'Quantity': quantity_label, 'Product': 'Product'},
+                 color_discrete_sequence=[color])
+    fig.update_layout(yaxis={'categoryorder':'total ascending'})
+    return fig
+
+
+def store_orders_figure(store_df):
+    """Horizontal bars of total orders per store (Store, Total Orders)."""
+    import plotly.express as px
+
+    fig = px.bar(store_df, x='Total Orders', y='Store', orientation='h', text='Total Orders',
+                 color_discrete_sequence=['#45B7D1'])
+    fig.update_traces(textposition='outside', texttemplate='%{text:,.0f}')
+    fig.update_layout(yaxis={'categoryorder': 'total ascending'}, showlegend=False,
+                      height=max(400, 30 * len(store_df)))
+    return fig
+
+
+def purchasing_gap_figure(gap_df):
+    """Horizontal bar chart of Purchasing Gap buckets by Percentage."""
+    import plotly.express as px
+
+    gap_df = gap_df.sort_values('Percentage', ascending=True)
+    fig = px.bar(gap_df, x='Percentage', y='Purchasing Gap', orientation='h',
+                 text=gap_df['Percentage'].apply(lambda x: f'{x:.1f}%'),
+                 color_discrete_sequence=['#1f77b4'])
+    fig.update_traces(textposition='outside')
+    fig.update_layout(
+        xaxis_title='Percentage (%)',
+        yaxis_title='Purchasing Gap',
+        showlegend=False,
+        height=400,
+        yaxis={'categoryorder':'total ascending'}
+    )
+    return fig
+
+
+def payment_totals_figure(pay_sum_df):
+    """Grouped bars of orders per payment method, one group per month."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for method in pay_sum_df.columns.drop('Month'):
+        fig.add_trace(go.Bar(
+            x=pay_sum_df['Month'], y=pay_sum_df[method],
+            name=method, marker_color=PAYMENT_COLORS.get(method, (None, None))[0],
+            text=pay_sum_df[method], textposition='outside'
+        ))
+    fig.update_layout(
+        barmode='group',
+        xaxis_title='Month',
+        yaxis_title='Total Orders',
+        hovermode='x unified',
+        height=450,
+        showlegend=True
+    )
+    return fig
+
+
+def payment_trend_figure(pay_df):
+    """Stacked area chart of daily orders per payment method."""
+    import plotly.graph_objects as go
+
+    pay_df = pay_df.sort_values('Day').reset_index(drop=True)
+    # Deduplicate by day (keep first occurrence)
+    pay_df = pay_df.drop_duplicates(subset=['Day'], keep='first')
+    methods = pay_df.columns.drop('Day')
+    scatter = go.Scattergl if len(pay_df) > WEBGL_POINT_THRESHOLD else go.Scatter
+    pay_df = reduce_points(pay_df, 'Day', methods)
+    fig = go.Figure()
+    for idx, method in enumerate(methods):
+        line_color, fill_color = PAYMENT_COLORS.get(method, (None, None))
+        fig.add_trace(scatter(
+            x=pay_df['Day'], y=pay_df[method],
+            name=method,
+            mode='lines',
+            fill='tozeroy' if idx == 0 else 'tonexty',
+            line=dict(color=line_color, width=2),
+            fillcolor=fill_color
+        ))
+    fig.update_layout(
+        xaxis_title='Day of Month',
+        yaxis_title='Number of Orders',
+        hovermode='x unified',
+        height=400,
+        showlegend=True,
+        # One tick per day for a month; let Plotly pick for longer ranges
+        xaxis=dict(dtick=1 if len(pay_df) <= 31 else None)
+    )
+    return fig
+
+
+def customer_pie_figure(new_orders, old_orders):
+    """Donut chart of new vs old customer orders."""
+    import plotly.express as px
+
+    pie_data = pd.DataFrame({'Customer Type': ['New Orders', 'Old Orders'], 'Count': [new_orders, old_orders]})
+    return px.pie(pie_data, values='Count', names='Customer Type', hole=0.4,
+                  color_discrete_sequence=px.colors.qualitative.Pastel)
+
+
+def daily_figure(daily, column, yaxis_title, color=None, y_tickformat=None, x_range=None):
+    """Line chart of one column of a daily frame over the months it covers,
+    or over x_range (start, end) when given."""
+    import plotly.express as px
+
+    series = daily[column].dropna().reset_index()
+    render_mode = 'webgl' if len(series) > WEBGL_POINT_THRESHOLD else 'auto'
+    if x_range is not None:
+        month_start, month_end = x_range
+    else:
+        month_start, _ = month_bounds(series['Date'].min())
+        _, month_end = month_bounds(series['Date'].max())
+    series = reduce_points(series, 'Date', [column])
+    fig = px.line(series, x='Date', y=column, color_discrete_sequence=[color] if color else None,
+                  render_mode=render_mode)
+    fig.update_layout(showlegend=False, xaxis_title=None, yaxis_title=yaxis_title)
+    fig.update_xaxes(tickformat='%d-%b', range=[month_start, month_end])
+    if y_tickformat:
+        fig.update_yaxes(tickformat=y_tickformat)
+    return fig
@@ -0,0 +1,170 @@
+import os
+import sqlite3
+import threading
+from contextlib import closing
+
+import pandas as pd
+
+from aggregate_store import STATE_DIR
+from month_registry import store_state_path
+
+# Purchasing gap buckets as (low, high) days, inclusive; None is open-ended.
+GAP_BUCKETS = ((0, 1), (2, 5), (6, 9), (10, 15), (16, 30), (31, None))
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS months (
+    month TEXT PRIMARY KEY, period TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS month_customers (
+    month TEXT NOT NULL, customer TEXT NOT NULL,
+    first_order TEXT NOT NULL, last_order TEXT NOT NULL, orders INTEGER NOT NULL,
+    PRIMARY KEY (month, customer));
+CREATE TABLE IF NOT EXISTS customers (
+    customer TEXT PRIMARY KEY,
+    first_order TEXT NOT NULL, last_order TEXT NOT NULL, orders INTEGER NOT NULL);
+'''
+
+_UPSERT = '''
+INSERT INTO customers VALUES (?, ?, ?, ?)
+ON CONFLICT (customer) DO UPDATE SET
+    first_order = MIN(first_order, excluded.first_order),
+    last_order = MAX(last_order, excluded.last_order),
+    orders = orders + excluded.orders
+'''
+
+_REBUILD = (
+    'DELETE FROM customers',
+    'INSERT INTO customers SELECT customer, MIN(first_order), MAX(last_order), SUM(orders) '
+    'FROM month_customers GROUP BY customer',
+)
+
+
+def customer_activity(orders):
+    """First and last order date and order count per customer of an orders
+    frame with customer and date columns."""
+    return orders.groupby('customer').agg(
+        first_order=('date', 'min'), last_order=('date', 'max'), orders=('date', 'size'))
+
+
+def gap_bucket_labels():
+    return [f'{low}+ days' if high is None else f'{low}-{high} days' for low, high in GAP_BUCKETS]
+
+
+class CohortIndex:
+    """SQLite index of customers (first order, last order, order count).
+    Each month's per-customer activity is kept as well, so adding the next
+    month only upserts that month's customers; re-applying or back-filling
+    a month rebuilds the customer table from the monthly rows, never from
+    raw orders. Month names are the dashboard's folder names, ordered by
+    their period (YYYY-MM)."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _query(self, sql, params=()):
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    @staticmethod
+    def _in_months(months):
+        return ', '.join('?' * len(months))
+
+    def apply_month(self, month, period, activity):
+        """Record a month's customer_activity() frame under month (folder
+        name) and period (a pandas Period or 'YYYY-MM')."""
+        period = str(period)
+        rows = [(month, str(customer), first.strftime('%Y-%m-%d'), last.strftime('%Y-%m-%d'), int(orders))
+                for customer, first, last, orders in zip(activity.index, activity['first_order'],
+                                                         activity['last_order'], activity['orders'])]
+        with self._lock, closing(self._connect()) as conn, conn:
+            latest = conn.execute('SELECT MAX(period) FROM months').fetchone()[0]
+            known = conn.execute('SELECT 1 FROM months WHERE month = ?', (month,)).fetchone() is not None
+            conn.execute('DELETE FROM month_customers WHERE month = ?', (month,))
+            conn.executemany('INSERT INTO month_customers VALUES (?, ?, ?, ?, ?)', rows)
+            conn.execute('INSERT OR REPLACE INTO months VALUES (?, ?)', (month, period))
+            if not known and (latest is None or period > latest):
+                conn.executemany(_UPSERT, [row[1:] for row in rows])
+            else:
+                for sql in _REBUILD:
+                    conn.execute(sql)
+
+    def months(self):
+        """Indexed month names in chronological order."""
+        with closing(self._connect()) as conn:
+            return [month for month, in conn.execute('SELECT month FROM months ORDER BY period, month')]
+
+    def covers(self, months):
+        return bool(months) and set(months) <= set(self.months())
+
+    def first_orders(self):
+        """Series of each known customer's first order date."""
+        df = self._query('SELECT customer, first_order FROM customers')
+        return pd.Series(pd.to_datetime(df['first_order']).to_numpy(), index=df['customer'], name='first_order')
+
+    def customer_split(self, months):
+        """Total, new and old orders and retention rate per month. An order is
+        new if it is the customer's first ever; retention is the share of
+        orders from returning customers."""
+        if not months:
+            return pd.DataFrame(columns=['Month', 'Total Orders', 'New Orders', 'Old Orders', 'Retention Rate'])
+        df = self._query(f'SELECT m.month, m.orders, m.first_order = c.first_order AS is_new '
+                         f'FROM month_customers m JOIN customers c USING (customer) '
+                         f'WHERE m.month IN ({self._in_months(months)})', list(months))
+        split = df.groupby('month').agg(total=('orders', 'sum'), new=('is_new', 'sum'))
+        split = split.reindex([month for month in months if month in split.index])
+        result = pd.DataFrame({
+            'Month': split.index,
+            'Total Orders': split['total'].to_numpy(),
+            'New Orders': split['new'].to_numpy(),
+            'Old Orders': (split['total'] - split['new']).to_numpy(),
+        })
+        result['Retention Rate'] = result['Old Orders'] / result['Total Orders'] * 100
+        return result
+
+    def purchasing_gap(self, months):
+        """Share of repeat customers per GAP_BUCKETS bucket, by their mean
+        days between orders within months. Every customer counts once, so
+        ranges of months are weighted by customers rather than averaged."""
+        labels = gap_bucket_labels()
+        if not months:
+            return pd.DataFrame(columns=['Purchasing Gap', 'Percentage'])
+        df = self._query(f'SELECT customer, MIN(first_order) AS first_order, MAX(last_order) AS last_order, '
+                         f'SUM(orders) AS orders FROM month_customers '
+                         f'WHERE month IN ({self._in_months(months)}) GROUP BY customer HAVING SUM(orders) > 1',
+                         list(months))
+        if df.empty:
+            return pd.DataFrame(columns=['Purchasing Gap', 'Percentage'])
+        span = (pd.to_datetime(df['last_order']) - pd.to_datetime(df['first_order'])).dt.days
+        mean_gap = (span / (df['orders'] - 1)).round()
+        edges = [low - 0.5 for low, _ in GAP_BUCKETS] + [float('inf')]
+        buckets = pd.cut(mean_gap, edges, labels=labels)
+        shares = buckets.value_counts(normalize=True, sort=False) * 100
+        return pd.DataFrame({'Purchasing Gap': shares.index.astype(str), 'Percentage': shares.to_numpy()})
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def index_path(base_path):
+    """Where the cohort index for base_path lives: base_path/.dashboard/
+    unless DASHBOARD_COHORT_DB points elsewhere (one file per store in the
+    multi-store layout)."""
+    if os.environ.get('DASHBOARD_COHORT_DB'):
+        return store_state_path(os.environ['DASHBOARD_COHORT_DB'], base_path)
+    return os.path.abspath(os.path.join(base_path, STATE_DIR, 'customers.sqlite'))
+
+
+def get_index(base_path):
+    """Process-wide cohort index for base_path."""
+    db_path = index_path(base_path)
+    with _indexes_lock:
+        if db_path not in _indexes:
+            _indexes[db_path] = CohortIndex(db_path)
+        return _indexes[db_path]
@@ -0,0 +1,173 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from figure_cache import source_version
+from timeseries import DAILY_METRICS, daily_frame, month_bounds
+
+ORDERS = DAILY_METRICS['orders']
+TURNOVER = DAILY_METRICS['turnover']
+ABV = DAILY_METRICS['abv']
+
+# Date-range presets, each ending on the last day with data
+RANGE_PRESETS = ('Month to date', 'Quarter to date', 'Year to date', 'Last 7 days', 'Last 30 days',
+                 'Last 90 days', 'All data')
+
+
+class DailyStore:
+    """Every month's daily metrics merged into one frame on a sorted, unique
+    DatetimeIndex. Ranges are located by binary search on the index, and
+    prefix sums of each metric make the totals of any range two lookups and
+    a subtraction, so range queries stay flat as the history grows."""
+
+    def __init__(self, frame):
+        frame = frame.reindex(columns=list(DAILY_METRICS.values()))
+        self.frame = frame
+        self._dates = frame.index.to_numpy()
+        values = frame.to_numpy(dtype='float64')
+        present = ~np.isnan(values)
+        # Orders and turnover of the days that have both, for the ABV
+        orders, turnover = values[:, frame.columns.get_loc(ORDERS)], values[:, frame.columns.get_loc(TURNOVER)]
+        paired = ~(np.isnan(orders) | np.isnan(turnover))
+        columns = np.column_stack([np.where(present, values, 0.0), present,
+                                   np.where(paired, orders, 0.0), np.where(paired, turnover, 0.0)])
+        self._prefix = np.vstack([np.zeros(columns.shape[1]), np.cumsum(columns, axis=0)])
+        self._width = values.shape[1]
+
+    @classmethod
+    def from_months(cls, month_files):
+        """Build from {month: {kind: path}}. Returns (store, errors) with
+        errors as {month: {kind: exception}} for files that failed to load."""
+        frames, errors = [], {}
+        for order, (month, files) in enumerate(month_files.items()):
+            daily, month_errors = daily_frame(files)
+            if month_errors:
+                errors[month] = month_errors
+            # daily_frame pads its months with empty days; only real rows
+            # take part in the merge, or padding could hide another month's data
+            daily = daily[daily.notna().any(axis=1)]
+            if daily.empty:
+                continue
+            periods = daily.index.to_period('M')
+            home = periods.value_counts().idxmax()
+            frames.append(daily.assign(_rank=np.where(periods == home, 0, 1), _order=order))
+        if not frames:
+            return cls(pd.DataFrame(index=pd.DatetimeIndex([], name='Date'))), errors
+        merged = pd.concat(frames).rename_axis('Date').reset_index()
+        # Months overlapping on a date (e.g. a stray next-month row in a
+        # sheet): per metric, the first non-NaN value wins, taken from the
+        # month whose own calendar month the date falls in, then earlier months
+        merged = merged.sort_values(['Date', '_rank', '_order'], kind='stable')
+        merged = merged.drop(columns=['_rank', '_order']).groupby('Date').first()
+        start, _ = month_bounds(merged.index.min())
+        _, end = month_bounds(merged.index.max())
+        return cls(merged.reindex(pd.date_range(start, end, freq='D', name='Date'))), errors
+
+    def __len__(self):
+        return len(self._dates)
+
+    @property
+    def first(self):
+        return self.frame.index[0] if len(self) else None
+
+    @property
+    def last(self):
+        """Last day with any data (not a calendar padding day)."""
+        if not len(self):
+            return None
+        has_data = self.frame.notna().any(axis=1).to_numpy()
+        return self.frame.index[len(has_data) - 1 - np.argmax(has_data[::-1])]
+
+    def bounds(self, start=None, end=None):
+        """Positions [lo, hi) of the days from start to end, inclusive."""
+        lo = 0 if start is None else int(np.searchsorted(self._dates, np.datetime64(pd.Timestamp(start)), 'left'))
+        hi = len(self) if end is None else int(np.searchsorted(self._dates, np.datetime64(pd.Timestamp(end)), 'right'))
+        return lo, max(lo, hi)
+
+    def slice(self, start=None, end=None):
+        lo, hi = self.bounds(start, end)
+        return self.frame.iloc[lo:hi]
+
+    def totals(self, start=None, end=None):
+        """Range totals: Total Orders, Turnover, Average Basket Value
+        (turnover over orders, on days that have both), mean of the daily
+        ABV sheet, Orders per Day and the number of Days with orders."""
+        lo, hi = self.bounds(start, end)
+        sums = self._prefix[hi] - self._prefix[lo]
+        width = self._width
+        metric = dict(zip(self.frame.columns, sums[:width]))
+        counts = dict(zip(self.frame.columns, sums[width:2 * width]))
+        paired_orders, paired_turnover = sums[2 * width], sums[2 * width + 1]
+        return {
+            'Total Orders': metric[ORDERS],
+            'Turnover': metric[TURNOVER],
+            'Average Basket Value': paired_turnover / paired_orders if paired_orders else np.nan,
+            'Mean Daily ABV': metric[ABV] / counts[ABV] if counts[ABV] else np.nan,
+            'Orders per Day': metric[ORDERS] / counts[ORDERS] if counts[ORDERS] else np.nan,
+            'Days': int(counts[ORDERS]),
+        }
+
+    def by_period(self, start=None, end=None, freq='M'):
+        """Orders, turnover and ABV per calendar period of the range."""
+        frame = self.slice(start, end)
+        if frame.empty:
+            return pd.DataFrame(columns=['Period', 'Total Orders', 'Turnover', 'Average Basket Value', 'Days'])
+        paired = frame[ORDERS].notna() & frame[TURNOVER].notna()
+        grouped = pd.DataFrame({
+            'Total Orders': frame[ORDERS],
+            'Turnover': frame[TURNOVER],
+            'paired_orders': frame[ORDERS].where(paired),
+            'paired_turnover': frame[TURNOVER].where(paired),
+        }).groupby(frame.index.to_period(freq))
+        sums = grouped.sum()
+        return pd.DataFrame({
+            'Period': sums.index.astype(str),
+            'Total Orders': sums['Total Orders'].round().astype('int64').to_numpy(),
+            'Turnover': sums['Turnover'].to_numpy(),
+            'Average Basket Value': (sums['paired_turnover'] / sums['paired_orders']).to_numpy(),
+            'Days': grouped['Total Orders'].count().to_numpy(),
+        })
+
+
+def preset_range(name, first, last):
+    """(start, end) of a RANGE_PRESETS entry for data from first to last."""
+    last = pd.Timestamp(last).normalize()
+    if name == 'Month to date':
+        start = last.replace(day=1)
+    elif name == 'Quarter to date':
+        start = last.to_period('Q').start_time
+    elif name == 'Year to date':
+        start = last.replace(month=1, day=1)
+    elif name.startswith('Last ') and name.endswith(' days'):
+        start = last - pd.Timedelta(days=int(name.split()[1]) - 1)
+    elif name == 'All data':
+        start = pd.Timestamp(first)
+    else:
+        raise ValueError(f'Unknown date range preset {name!r}')
+    return max(start, pd.Timestamp(first)), last
+
+
+def daily_sources(month_files):
+    return [files.get(kind) for files in month_files.values() for kind in DAILY_METRICS]
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_daily_store(month_files):
+    """Process-wide DailyStore for {month: {kind: path}}, rebuilt when one
+    of the daily files changes. Returns (store, errors) like from_months."""
+    key = tuple(month_files)
+    version = source_version(daily_sources(month_files))
+    with _stores_lock:
+        cached = _stores.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+    store, errors = DailyStore.from_months(month_files)
+    with _stores_lock:
+        # Only the latest month set is kept
+        _stores.clear()
+        _stores[key] = (version, store, errors)
+    return store, errors
@@ -0,0 +1,606 @@
+import contextvars
+import itertools
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import perf
+from excel_engine import iter_rows, read_excel, resolve_engine
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional; without it every load parses the xlsx
+    pa = feather = None
+
+# Maximum number of parsed files, and their total size, kept in memory
+# before the least recently used entries are evicted.
+MAX_CACHE_ENTRIES = int(os.environ.get('DASHBOARD_CACHE_ENTRIES', '128'))
+MAX_CACHE_BYTES = int(float(os.environ.get('DASHBOARD_CACHE_MAX_MB', '256')) * 1024 * 1024)
+
+# Cached frames are handed out as shallow copies, which copy-on-write turns
+# into private copies on first modification. It is always on from pandas 3;
+# before that the entry points turn it on with enable_copy_on_write.
+_PANDAS_MAJOR = int(pd.__version__.split('.')[0])
+
+# Parsed files are also persisted as uncompressed Arrow (Feather v2) sidecars
+# under <month>/.sidecar/, which can be memory-mapped instead of re-parsed.
+# Each records the stamp of the source it was parsed from in its schema
+# metadata, and is only used while the source still has that stamp.
+SIDECAR_DIR = '.sidecar'
+_SIDECAR_STAMP_KEY = b'dashboard.source_stamp'
+SIDECARS_ENABLED = feather is not None and os.environ.get('DASHBOARD_SIDECARS', '1') != '0'
+
+# Glob patterns per file kind, in order of preference.
+MONTH_FILE_PATTERNS = {
+    'kpi': ['*kpi*.xlsx'],
+    'items': ['ITEMS.xlsx', 'All_Product*.xlsx', 'product*.xlsx'],
+    'abv': ['*abv*.xlsx'],
+    'orders': ['*orders*.xlsx'],
+    'turnover': ['*turnover*.xlsx'],
+    'purchasing_gap': ['*purchasing_gap*.xlsx'],
+    'payment_method': ['*payment_method*.xlsx'],
+}
+
+
+def value_nbytes(value):
+    """Approximate memory held by a cached value."""
+    if value is None:
+        return 0
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    return sys.getsizeof(value)
+
+
+def file_stamp(path):
+    """(mtime_ns, size) of a file: what the caches compare to tell whether
+    it changed."""
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def enable_copy_on_write():
+    """Turn on pandas copy-on-write for the process (a no-op from pandas 3,
+    where it is always on). Called by the app and server entry points
+    rather than on import, as it changes pandas' behaviour everywhere."""
+    if _PANDAS_MAJOR < 3:
+        pd.set_option('mode.copy_on_write', True)
+
+
+def _copy_on_write():
+    return _PANDAS_MAJOR >= 3 or pd.get_option('mode.copy_on_write') is True
+
+
+def shared_view(value):
+    """What callers get for a cached value: frames and series as shallow,
+    copy-on-write copies, so modifying them never reaches the cache and
+    reading them copies nothing. Without copy-on-write they are deep copies."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=not _copy_on_write())
+    return value
+
+
+class FileCache:
+    """Bounded LRU cache of parsed Excel files, shared by every session in
+    the process. Entries are keyed on (path, kind) and stamped with the
+    file's mtime and size, so an unchanged file is served from memory
+    without being opened while a modified file is transparently re-parsed.
+    Entries are evicted beyond max_entries or max_bytes in total; a value
+    larger than max_bytes on its own is returned but not kept."""
+
+    def __init__(self, max_entries=MAX_CACHE_ENTRIES, max_bytes=MAX_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+
+    def lookup(self, path, kind):
+        """Return (hit, value, stamp) for the file's current mtime and size."""
+        path = os.path.abspath(path)
+        key = (path, kind)
+        stamp = file_stamp(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                perf.count('data_cache_hits')
+                return True, shared_view(entry[1]), stamp
+            self.misses += 1
+        perf.count('data_cache_misses')
+        return False, None, stamp
+
+    def _remove(self, key):
+        self.bytes -= self._entries.pop(key)[2]
+
+    def store(self, path, kind, stamp, value):
+        key = (os.path.abspath(path), kind)
+        nbytes = value_nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (stamp, value, nbytes)
+            self.bytes += nbytes
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def get(self, path, kind, loader):
+        hit, value, stamp = self.lookup(path, kind)
+        if hit:
+            return value
+        value = loader(os.path.abspath(path))
+        self.store(path, kind, stamp, value)
+        return shared_view(value)
+
+    def clear_folder(self, folder):
+        """Drop every entry for files inside folder. Returns the number removed."""
+        prefix = os.path.join(os.path.abspath(folder), '')
+        with self._lock:
+            stale = [key for key in self._entries if key[0].startswith(prefix)]
+            for key in stale:
+                self._remove(key)
+        return len(stale)
+
+    def clear_file(self, path):
+        """Drop the entries of every kind for one file. Returns the number removed."""
+        path = os.path.abspath(path)
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == path]
+            for key in stale:
+                self._remove(key)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_cache = FileCache()
+
+
+def cached(filepath, kind, loader):
+    """Cache a value derived from filepath under its own kind, so it is
+    recomputed only when the file changes."""
+    return _cache.get(filepath, kind, loader)
+
+
+def clear_month(month_path):
+    """Invalidate the cached files of a single month folder."""
+    return _cache.clear_folder(month_path)
+
+
+def clear_file(filepath):
+    """Invalidate everything cached for a single file."""
+    return _cache.clear_file(filepath)
+
+
+def clear_all():
+    _cache.clear()
+
+
+def cache_stats():
+    return {'entries': len(_cache), 'hits': _cache.hits, 'misses': _cache.misses,
+            'bytes': _cache.bytes, 'max_bytes': _cache.max_bytes}
+
+
+# Payment methods always reported, in this order, even when absent from a
+# grid. Any other "<Label>: <count>" cells found below a day number (within
+# PAYMENT_LOOKAHEAD_ROWS) are reported after them; labels elsewhere in the
+# sheet, e.g. a "Total: 120" cell, are not methods.
+PAYMENT_METHODS = ('COD', 'Instamojo')
+# How many rows below a day-number row are searched for method counts.
+PAYMENT_LOOKAHEAD_ROWS = 4
+_METHOD_LABEL_RE = re.compile(r'([A-Za-z][A-Za-z0-9_]*):\s*\d+')
+
+
+def _payment_methods(cells):
+    """Default methods plus any other labels found in the grid's cells."""
+    methods = list(PAYMENT_METHODS)
+    known = {method.lower() for method in methods}
+    for label in cells.str.extractall(_METHOD_LABEL_RE)[0].unique():
+        if label.lower() not in known:
+            known.add(label.lower())
+            methods.append(label)
+    return methods
+
+
+def _first_flagged_offset(flags, lookahead):
+    """For every row, the smallest offset in 1..lookahead at which flags is
+    set on a row below it, or 0 when none is."""
+    n = len(flags)
+    first = np.zeros(n, dtype=np.int64)
+    for offset in range(min(lookahead, n - 1), 0, -1):
+        below = np.zeros(n, dtype=bool)
+        below[:n - offset] = flags[offset:]
+        first[below] = offset
+    return first
+
+
+def parse_payment_grid(raw, methods=None):
+    """Parse a header-less calendar grid frame into one row per day cell.
+    Day-number rows are found with a numeric mask over the whole grid and
+    each is matched to the first rows within PAYMENT_LOOKAHEAD_ROWS below it
+    holding "<method>: <count>" cells; a row with several methods in one
+    cell takes precedence over separate rows. Returns a frame with a Day
+    column and one count column per payment method, in grid order."""
+    if methods is None:
+        methods = list(PAYMENT_METHODS)
+        auto_detect = True
+    else:
+        methods = list(methods)
+        auto_detect = False
+    n_rows, n_cols = raw.shape
+    if n_rows == 0 or n_cols == 0:
+        return pd.DataFrame({col: pd.Series(dtype='int64') for col in ['Day'] + methods})
+
+    numeric = raw.apply(lambda col: pd.to_numeric(col, errors='coerce')).to_numpy(dtype=float)
+    with np.errstate(invalid='ignore'):
+        days = np.trunc(numeric)
+        day_mask = (days >= 1) & (days <= 31)
+
+    cells = pd.Series(raw.astype(str).to_numpy().ravel())
+    cells_lower = cells.str.lower()
+    if auto_detect:
+        below_day = np.zeros_like(day_mask)
+        for offset in range(1, min(PAYMENT_LOOKAHEAD_ROWS, n_rows - 1) + 1):
+            below_day[offset:] |= day_mask[:-offset]
+        methods = _payment_methods(cells[(below_day & ~day_mask).ravel()])
+
+    present = {}
+    counts = {}
+    for method in methods:
+        key = method.lower()
+        present[method] = cells_lower.str.contains(f'{key}:', regex=False).to_numpy().reshape(n_rows, n_cols)
+        pattern = re.compile(rf'{re.escape(key)}:\s*(\d+)', re.IGNORECASE)
+        extracted = pd.to_numeric(cells.str.extract(pattern)[0], errors='coerce')
+        counts[method] = extracted.fillna(0).to_numpy(dtype=np.int64).reshape(n_rows, n_cols)
+
+    methods_per_cell = sum(mask.astype(np.int64) for mask in present.values())
+    first_combined = _first_flagged_offset((methods_per_cell >= 2).any(axis=1), PAYMENT_LOOKAHEAD_ROWS)
+    row_index = np.arange(n_rows)
+    source_rows = {}
+    has_source = first_combined > 0
+    for method in methods:
+        first = _first_flagged_offset(present[method].any(axis=1), PAYMENT_LOOKAHEAD_ROWS)
+        offset = np.where(first_combined > 0, first_combined, first)
+        source_rows[method] = np.where(offset > 0, row_index + offset, -1)
+        has_source |= first > 0
+
+    rows, cols = np.nonzero(day_mask & has_source[:, None])
+    parsed = {'Day': days[rows, cols].astype(np.int64)}
+    for method in methods:
+        source = source_rows[method][rows]
+        values = counts[method][np.clip(source, 0, None), cols]
+        parsed[method] = np.where(source >= 0, values, 0)
+    return pd.DataFrame(parsed)
+
+
+def parse_payment_file(filepath, engine=None):
+    """Parse a calendar-grid payment method Excel file.
+    Returns list of dicts with keys: Day plus one per payment method.
+    Handles both separate-row and combined-cell formats."""
+    return parse_payment_grid(read_excel(filepath, engine, header=None)).to_dict('records')
+
+
+# Items header detection only looks at the first few rows of the sheet.
+ITEMS_HEADER_SCAN_ROWS = 10
+ITEMS_HEADER_RE = re.compile(r'row labels|product|item')
+
+
+def _items_column_roles(header):
+    """Map a header row to the indexes of its Product and Quantity columns."""
+    product_col = quantity_col = None
+    for col_idx, name in enumerate(header):
+        if name is None:
+            continue
+        name = str(name).lower()
+        if 'row labels' in name or 'product' in name or 'item' in name:
+            if product_col is None:
+                product_col = col_idx
+        elif 'quantity' in name or 'qty' in name:
+            if quantity_col is None:
+                quantity_col = col_idx
+    return product_col, quantity_col
+
+
+def _to_quantity(value):
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return None if value != value else value
+    try:
+        return float(str(value).strip())
+    except ValueError:
+        return None
+
+
+def read_items_file(filepath, engine=None):
+    """Stream a product quantity sheet whose header row may be preceded by
+    blank or title rows. The header is detected, rows are filtered and
+    quantities are summed per product in a single read-only pass, so memory
+    grows with the number of distinct products rather than with file size.
+    Returns a frame with Product and Quantity columns sorted by product, or
+    None if either column cannot be identified."""
+    rows = iter_rows(filepath, engine)
+    try:
+        # Buffer only the scan window; fall back to the first row as header
+        # when no row in it looks like one.
+        window = []
+        header = None
+        for row in rows:
+            window.append(row)
+            if any(cell is not None and ITEMS_HEADER_RE.search(str(cell).lower()) for cell in row):
+                header = row
+                break
+            if len(window) == ITEMS_HEADER_SCAN_ROWS:
+                break
+        if not window:
+            return None
+        if header is None:
+            header = window[0]
+            pending = window[1:]
+        else:
+            pending = []
+        product_col, quantity_col = _items_column_roles(header)
+        if product_col is None or quantity_col is None:
+            return None
+        totals = {}
+        for row in itertools.chain(pending, rows):
+            product = row[product_col] if product_col < len(row) else None
+            if product is None or (isinstance(product, float) and product != product):
+                continue
+            if 'grand total' in str(product).lower():
+                continue
+            quantity = _to_quantity(row[quantity_col] if quantity_col < len(row) else None)
+            totals[product] = totals.get(product, 0) + (quantity or 0)
+    finally:
+        rows.close()
+    products = sorted(totals, key=str)
+    return pd.DataFrame({'Product': products, 'Quantity': [totals[p] for p in products]})
+
+
+def read_payment_frame(filepath, engine=None):
+    raw = read_excel(filepath, engine, header=None)
+    with perf.timer('parse', os.path.basename(filepath), kind='payment_method') as event:
+        df = parse_payment_grid(raw)
+        event['rows'] = len(df)
+    return df
+
+
+# Parsers per file kind; each takes (filepath, engine=None), see excel_engine.py
+READERS = {
+    'kpi': read_excel,
+    'items': read_items_file,
+    'abv': read_excel,
+    'orders': read_excel,
+    'turnover': read_excel,
+    'purchasing_gap': read_excel,
+    'payment_method': read_payment_frame,
+}
+
+
+def sidecar_path(filepath, kind):
+    folder, name = os.path.split(os.path.abspath(filepath))
+    return os.path.join(folder, SIDECAR_DIR, f'{os.path.splitext(name)[0]}.{kind}.arrow')
+
+
+def _encode_stamp(stamp):
+    return '{}:{}'.format(*stamp).encode()
+
+
+def sidecar_is_fresh(filepath, kind):
+    """True when the sidecar was written from the source as it is now, i.e.
+    the stamp in its metadata equals the source's mtime_ns and size. A
+    newer sidecar alone is not enough: a restored backup or a copy made
+    with cp -p has an older mtime than the sidecar of the file it replaced."""
+    if pa is None:
+        return False
+    try:
+        stamp = file_stamp(filepath)
+        with pa.memory_map(sidecar_path(filepath, kind)) as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return False
+    return metadata.get(_SIDECAR_STAMP_KEY) == _encode_stamp(stamp)
+
+
+def write_sidecar(df, filepath, kind, stamp=None):
+    """Persist a parsed frame next to its source, recording the source's
+    stamp (taken before it was parsed; default: now). Returns True on
+    success; frames Arrow cannot represent and read-only folders are
+    skipped."""
+    if feather is None or df is None:
+        return False
+    target = sidecar_path(filepath, kind)
+    tmp = f'{target}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        stamp = stamp or file_stamp(filepath)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        df = df.copy()
+        df.columns = [str(col) for col in df.columns]
+        table = pa.Table.from_pandas(df)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                               _SIDECAR_STAMP_KEY: _encode_stamp(stamp)})
+        feather.write_feather(table, tmp, compression='uncompressed')
+        os.replace(tmp, target)
+        return True
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return False
+
+
+def read_file(filepath, kind):
+    """Parse a monthly file, preferring a sidecar written from the source
+    as it is now."""
+    name = os.path.basename(filepath)
+    if SIDECARS_ENABLED and sidecar_is_fresh(filepath, kind):
+        try:
+            with perf.timer('read', name, kind=kind, source='sidecar') as event:
+                df = feather.read_feather(sidecar_path(filepath, kind), memory_map=True)
+                event['rows'] = len(df)
+            return df
+        except Exception:
+            pass
+    # Stamped before parsing, so a change made meanwhile is not recorded as parsed
+    stamp = file_stamp(filepath)
+    # For payment grids this includes the separately reported parse step
+    with perf.timer('read', name, kind=kind, source='xlsx', engine=resolve_engine()) as event:
+        df = READERS[kind](filepath)
+        event['rows'] = 0 if df is None else len(df)
+    if SIDECARS_ENABLED:
+        write_sidecar(df, filepath, kind, stamp)
+    return df
+
+
+def build_month_sidecars(month_files, force=False):
+    """Write sidecars for a month's files, given as a {kind: path} mapping.
+    Returns a list of (kind, source path, status) tuples."""
+    results = []
+    for kind, source in month_files.items():
+        if not force and sidecar_is_fresh(source, kind):
+            results.append((kind, source, 'fresh'))
+            continue
+        try:
+            stamp = file_stamp(source)
+            ok = write_sidecar(READERS[kind](source), source, kind, stamp)
+            results.append((kind, source, 'written' if ok else 'skipped'))
+        except Exception as e:
+            results.append((kind, source, f'error: {e}'))
+    return results
+
+
+# Cached loaders. Every rerun and session reads the same cached frames
+# through copy-on-write views, so callers may modify what they get.
+
+def _load(filepath, kind):
+    return _cache.get(filepath, kind, lambda path: read_file(path, kind))
+
+
+def load_kpi(filepath):
+    return _load(filepath, 'kpi')
+
+
+def load_items(filepath):
+    return _load(filepath, 'items')
+
+
+def load_abv(filepath):
+    return _load(filepath, 'abv')
+
+
+def load_orders(filepath):
+    return _load(filepath, 'orders')
+
+
+def load_turnover(filepath):
+    return _load(filepath, 'turnover')
+
+
+def load_purchasing_gap(filepath):
+    return _load(filepath, 'purchasing_gap')
+
+
+def load_payment(filepath):
+    return _load(filepath, 'payment_method')
+
+
+LOADERS = {
+    'kpi': load_kpi,
+    'items': load_items,
+    'abv': load_abv,
+    'orders': load_orders,
+    'turnover': load_turnover,
+    'purchasing_gap': load_purchasing_gap,
+    'payment_method': load_payment,
+}
+
+# Worker count and pool type for load_months. Threads share the in-process
+# cache directly; processes sidestep the GIL for openpyxl parsing and their
+# results are copied back into the cache.
+LOAD_WORKERS = int(os.environ.get('DASHBOARD_LOAD_WORKERS', '8'))
+LOAD_EXECUTOR = os.environ.get('DASHBOARD_LOAD_EXECUTOR', 'thread')
+
+LoadError = namedtuple('LoadError', ['month', 'kind', 'path', 'error'])
+
+
+def load_months(month_files, kinds, max_workers=None, executor=None):
+    """Load every (month, kind) file concurrently.
+    month_files maps month name to its {kind: path} files. Returns
+    (data, errors), where data[month][kind] holds the loaded frame (and
+    data[month][kind + '_file'] its path) and errors lists a LoadError for
+    every file that failed."""
+    max_workers = max_workers or LOAD_WORKERS
+    executor = executor or LOAD_EXECUTOR
+    data = {month: {} for month in month_files}
+    errors = []
+    tasks = []
+    for month, files in month_files.items():
+        for kind in kinds:
+            path = files.get(kind)
+            if path is not None:
+                data[month][f'{kind}_file'] = path
+                tasks.append((month, kind, path))
+    if not tasks:
+        return data, errors
+
+    workers = max(1, min(max_workers, len(tasks)))
+    if executor == 'process':
+        pending = []
+        for month, kind, path in tasks:
+            try:
+                hit, value, stamp = _cache.lookup(path, kind)
+            except OSError as e:
+                errors.append(LoadError(month, kind, path, e))
+                continue
+            if hit:
+                data[month][kind] = value
+            else:
+                pending.append((month, kind, path, stamp))
+        if not pending:
+            return data, errors
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+            futures = {pool.submit(read_file, os.path.abspath(path), kind): (month, kind, path, stamp)
+                       for month, kind, path, stamp in pending}
+            for future in as_completed(futures):
+                month, kind, path, stamp = futures[future]
+                try:
+                    value = future.result()
+                except Exception as e:
+                    errors.append(LoadError(month, kind, path, e))
+                    continue
+                _cache.store(path, kind, stamp, value)
+                data[month][kind] = shared_view(value)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Each task runs in a copy of the caller's context, so perf
+            # timers in the workers report to the caller's run.
+            futures = {pool.submit(contextvars.copy_context().run, LOADERS[kind], path): (month, kind, path)
+                       for month, kind, path in tasks}
+            for future in as_completed(futures):
+                month, kind, path = futures[future]
+                try:
+                    data[month][kind] = future.result()
+                except Exception as e:
+                    errors.append(LoadError(month, kind, path, e))
+    order = {(month, kind): idx for idx, (month, kind, _) in enumerate(tasks)}
+    errors.sort(key=lambda err: order[(err.month, err.kind)])
+    return data, errors
@@ -1,39 +1,53 @@
 import os
-import glob
+import sys
 import pandas as pd
+from data_loader import MONTH_FILE_PATTERNS, build_month_sidecars
+from month_registry import get_registry
 
-BASE_PATH = r'c:/Users/anilk/OneDrive/Desktop/LAST_RIDE'
-month_folders = ['NOV', 'DEC', 'JAN']
+# Usage: python diagnose.py [BASE_PATH] [--build-sidecars [--force]]
+args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+BASE_PATH = args[0] if args else os.path.dirname(os.path.abspath(__file__))
+BUILD_SIDECARS = '--build-sidecars' in sys.argv
+FORCE = '--force' in sys.argv
+registry = get_registry(BASE_PATH)
+month_folders = registry.months()
 
 print("=" * 60)
 print("DASHBOARD DATA DIAGNOSTIC")
 print("=" * 60)
 
+print(f"Base path: {BASE_PATH}")
+print(f"Months found: {', '.join(month_folders) or 'none'}")
+
 for month in month_folders:
+    entry = registry.month(month)
     print(f"\n### {month} ###")
-    month_path = os.path.join(BASE_PATH, month)
-    print(f"Path: {month_path}")
-    print(f"Exists: {os.path.exists(month_path)}")
-    
-    if os.path.exists(month_path):
-        # Check KPI file
-        kpi_files = glob.glob(os.path.join(month_path, '*kpi*.xlsx'))
-        print(f"KPI files found: {len(kpi_files)}")
-        if kpi_files:
-            print(f"  - {os.path.basename(kpi_files[0])}")
-            try:
-                kpi_df = pd.read_excel(kpi_files[0])
-                print(f"  - Rows: {len(kpi_df)}, Columns: {list(kpi_df.columns)}")
-            except Exception as e:
-                print(f"  - Error reading: {e}")
-        
-        # Check other files
-        for pattern in ['*orders*.xlsx', '*abv*.xlsx', '*turnover*.xlsx']:
-            files = glob.glob(os.path.join(month_path, pattern))
-            if files:
-                print(f"{pattern}: {os.path.basename(files[0])}")
+    print(f"Path: {entry.path}")
+    print(f"Year: {entry.year or 'not in folder name'}")
+
+    # Check KPI file
+    kpi_file = entry.files.get('kpi')
+    print(f"KPI file found: {kpi_file is not None}")
+    if kpi_file:
+        print(f"  - {os.path.basename(kpi_file)}")
+        try:
+            kpi_df = pd.read_excel(kpi_file)
+            print(f"  - Rows: {len(kpi_df)}, Columns: {list(kpi_df.columns)}")
+        except Exception as e:
+            print(f"  - Error reading: {e}")
+
+    # Check other files
+    for kind in MONTH_FILE_PATTERNS:
+        if kind != 'kpi':
+            found = entry.files.get(kind)
+            print(f"{kind}: {os.path.basename(found) if found else 'MISSING'}")
+
+    if BUILD_SIDECARS:
+        print("Sidecars:")
+        for kind, source, status in build_month_sidecars(entry.files, force=FORCE):
+            print(f"  - {kind}: {os.path.basename(source)} -> {status}")
 
 print("\n" + "=" * 60)
-print("If all files show 'found', the data is accessible.")
-print("If you see 'Exists: False', check the BASE_PATH.")
+print("If no files show 'MISSING', the data is accessible.")
+print("If no months are found, check the BASE_PATH.")
 print("=" * 60)
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+
+def _as_numeric(x):
+    """x as float64, with datetimes as nanoseconds since the epoch."""
+    x = pd.Series(x)
+    if pd.api.types.is_datetime64_any_dtype(x):
+        return x.astype('datetime64[ns]').astype('int64').to_numpy(dtype='float64')
+    return x.to_numpy(dtype='float64')
+
+
+def lttb_indices(x, y, n_out):
+    """Indices of the points kept by Largest-Triangle-Three-Buckets.
+    The first and last points are always kept; every bucket in between
+    contributes the point forming the largest triangle with the previous
+    kept point and the mean of the next bucket, which preserves peaks and
+    the overall shape. x must be sorted."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = _as_numeric(x)
+    y = np.asarray(y, dtype='float64')
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    kept = np.empty(n_out, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        nxt_start, nxt_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nxt_start:nxt_end].mean()
+        avg_y = y[nxt_start:nxt_end].mean()
+        area = np.abs((x[prev] - avg_x) * (y[start:end] - y[prev])
+                      - (x[prev] - x[start:end]) * (avg_y - y[prev]))
+        prev = start + int(np.argmax(area))
+        kept[i + 1] = prev
+    return kept
+
+
+def minmax_indices(y, n_out):
+    """Indices of the minimum and maximum of each of n_out // 2 buckets, in
+    order, plus the first and last points. Cheaper than LTTB and keeps
+    every extreme, at the cost of a jaggier line."""
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+    y = np.asarray(y, dtype='float64')
+    edges = np.linspace(0, n, n_out // 2 + 1).astype(int)
+    kept = [0, n - 1]
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            kept.append(start + int(np.nanargmin(y[start:end])))
+            kept.append(start + int(np.nanargmax(y[start:end])))
+    return np.unique(kept)
+
+
+DOWNSAMPLERS = {
+    'lttb': lambda x, y, n_out: lttb_indices(x, y, n_out),
+    'minmax': lambda x, y, n_out: minmax_indices(y, n_out),
+}
+
+
+def downsample(x, y, n_out, method='lttb'):
+    """Positions of the points to plot for the series (x, y)."""
+    return DOWNSAMPLERS[method](x, y, n_out)
@@ -0,0 +1,74 @@
+import importlib.util
+import os
+
+import pandas as pd
+
+# Engine for every xlsx read of the dashboard's loaders: 'auto' uses
+# calamine (the Rust-based python-calamine package) when it is installed and
+# openpyxl otherwise; 'calamine' or 'openpyxl' forces one of them.
+EXCEL_ENGINE = os.environ.get('DASHBOARD_EXCEL_ENGINE', 'auto')
+ENGINES = ('calamine', 'openpyxl')
+CALAMINE_AVAILABLE = importlib.util.find_spec('python_calamine') is not None
+
+
+def resolve_engine(engine=None):
+    """'calamine' or 'openpyxl' for engine (default EXCEL_ENGINE)."""
+    engine = (engine or EXCEL_ENGINE).strip().lower()
+    if engine == 'auto':
+        return 'calamine' if CALAMINE_AVAILABLE else 'openpyxl'
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown Excel engine {engine!r}; use auto, {' or '.join(ENGINES)}")
+    if engine == 'calamine' and not CALAMINE_AVAILABLE:
+        raise ImportError('The calamine Excel engine needs the python-calamine package')
+    return engine
+
+
+def read_excel(filepath, engine=None, **kwargs):
+    """pd.read_excel with the configured engine."""
+    return pd.read_excel(filepath, engine=resolve_engine(engine), **kwargs)
+
+
+def _calamine_value(value):
+    # calamine reads every number as a float and empty cells as ''; match
+    # openpyxl (and pandas' calamine reader), which return whole numbers as int
+    if value == '':
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _calamine_rows(filepath):
+    from python_calamine import CalamineWorkbook
+
+    wb = CalamineWorkbook.from_path(filepath)
+    try:
+        for row in wb.get_sheet_by_index(0).iter_rows():
+            yield tuple(_calamine_value(value) for value in row)
+    finally:
+        wb.close()
+
+
+def _openpyxl_rows(filepath):
+    import openpyxl
+
+    wb = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        ws.reset_dimensions()
+        yield from ws.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+ROW_READERS = {
+    'calamine': _calamine_rows,
+    'openpyxl': _openpyxl_rows,
+}
+
+
+def iter_rows(filepath, engine=None):
+    """The first sheet's cell values as a tuple per row, None for empty
+    cells. Rows may differ in length, and trailing empty rows and cells
+    depend on the engine."""
+    return ROW_READERS[resolve_engine(engine)](filepath)
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import perf
+
+# Finished Plotly figures, reused until their source files change. A
+# figure's version is derived from the mtime and size of the files it is
+# built from (plus any extra values passed in), not from a hash of the data
+# itself: rewriting a file with identical contents still rebuilds its charts,
+# and a change that keeps both the mtime and size is not noticed.
+
+MAX_FIGURE_ENTRIES = int(os.environ.get('DASHBOARD_FIGURE_CACHE_ENTRIES', '256'))
+MAX_FIGURE_BYTES = int(float(os.environ.get('DASHBOARD_FIGURE_CACHE_MAX_MB', '64')) * 1024 * 1024)
+
+# Data properties whose values grow with the data, and rough allowances for
+# the rest: a Figure holds about 125 KB (mostly its layout template) before
+# any data is added.
+_DATA_PROPERTIES = ('x', 'y', 'values', 'labels', 'text', 'customdata')
+_FIGURE_BYTES = 128 * 1024
+_TRACE_BYTES = 2048
+
+
+def source_version(paths, *extra):
+    """Hash of the mtime and size of every source file (None for missing
+    ones) plus any extra values that change the chart, e.g. the month list."""
+    digest = hashlib.sha1()
+    for path in paths:
+        if path is None:
+            digest.update(b'-\0')
+            continue
+        try:
+            stat = os.stat(path)
+            digest.update(f'{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}\0'.encode())
+        except OSError:
+            digest.update(f'{os.path.abspath(path)}|missing\0'.encode())
+    for value in extra:
+        digest.update(f'{value!r}\0'.encode())
+    return digest.hexdigest()
+
+
+def figure_bytes(fig):
+    """Estimated memory size of a figure, without serializing it: 64 bytes
+    per plotted value (a boxed Python scalar in a tuple) plus allowances for
+    the figure and each trace."""
+    if fig is None:
+        return 0
+    total = _FIGURE_BYTES
+    for trace in fig.data:
+        total += _TRACE_BYTES
+        for name in _DATA_PROPERTIES:
+            if name in trace and trace[name] is not None:
+                total += 64 * len(trace[name])
+    return total
+
+
+class FigureCache:
+    """LRU cache of finished Plotly figures keyed by (month, chart id) and
+    stamped with a source version (see source_version). The Figure objects
+    themselves are kept, so a hit skips both the data preparation and the
+    figure construction. A build returning None (nothing to plot) is cached
+    too. Entry sizes are estimated with figure_bytes."""
+
+    def __init__(self, max_entries=MAX_FIGURE_ENTRIES, max_bytes=MAX_FIGURE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+
+    def _remove(self, key):
+        self.bytes -= self._entries.pop(key)['bytes']
+
+    def get(self, month, chart_id, version, build):
+        key = (month, chart_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['version'] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                perf.count('figure_cache_hits')
+                return entry['figure']
+            self.misses += 1
+        perf.count('figure_cache_misses')
+        with perf.timer('figure', f'{month}/{chart_id}'):
+            fig = build()
+        entry = {'version': version, 'figure': fig, 'bytes': figure_bytes(fig)}
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if entry['bytes'] <= self.max_bytes:
+                self._entries[key] = entry
+                self.bytes += entry['bytes']
+                while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                    self._remove(next(iter(self._entries)))
+        return fig
+
+    def get_json(self, month, chart_id, version, build):
+        """Like get, but returns the figure's JSON spec (serialized on each
+        call)."""
+        fig = self.get(month, chart_id, version, build)
+        return fig.to_json() if fig is not None else None
+
+    def discard(self, month, chart_id):
+        with self._lock:
+            if (month, chart_id) not in self._entries:
+                return False
+            self._remove((month, chart_id))
+        return True
+
+    def clear_month(self, month):
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == month]
+            for key in stale:
+                self._remove(key)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                'bytes': self.bytes, 'max_bytes': self.max_bytes}
+
+
+figures = FigureCache()
+
+
+def cached_figure(month, chart_id, sources, build, *extra):
+    """Figure for chart_id in month, rebuilt only when the source files (or
+    extra) change. Returned figures are shared and must not be modified."""
+    return figures.get(month, chart_id, source_version(sources, *extra), build)
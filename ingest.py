@@ -0,0 +1,263 @@
+import calendar
+import os
+import sys
+
+import openpyxl
+import pandas as pd
+
+from cohort_index import customer_activity, get_index
+from timeseries import parse_dates
+
+# Accepted header names (lower-case, '_' read as ' ') for each column of a
+# raw order-line export. Quantity, product and payment are optional.
+RAW_COLUMNS = {
+    'order_id': ('order id', 'order number', 'order no', 'order', 'invoice id', 'invoice number'),
+    'date': ('order date', 'date', 'created at', 'invoice date'),
+    'customer': ('customer id', 'customer', 'customer email', 'email', 'customer phone', 'phone'),
+    'product': ('product', 'product name', 'item', 'item name'),
+    'quantity': ('quantity', 'qty', 'quantity invoiced', 'quantity sold'),
+    'amount': ('line total', 'amount', 'total', 'line amount', 'net amount', 'price'),
+    'payment': ('payment method', 'payment', 'payment mode', 'gateway'),
+}
+REQUIRED_COLUMNS = ('order_id', 'date', 'customer', 'amount')
+
+# Rows read per chunk; memory use is bounded by this and by the number of
+# distinct orders, not by the number of order lines.
+INGEST_CHUNK_ROWS = int(os.environ.get('DASHBOARD_INGEST_CHUNK_ROWS', '200000'))
+# Order-level partials are merged once this many chunks have accumulated.
+_MERGE_EVERY = 16
+
+
+def resolve_columns(header):
+    """Map each RAW_COLUMNS role to its header name. Raises ValueError if a
+    required column is missing."""
+    normalized = {str(name).strip().lower().replace('_', ' '): name for name in header if name is not None}
+    roles = {}
+    for role, candidates in RAW_COLUMNS.items():
+        for candidate in candidates:
+            if candidate in normalized:
+                roles[role] = normalized[candidate]
+                break
+    missing = [role for role in REQUIRED_COLUMNS if role not in roles]
+    if missing:
+        raise ValueError(f"Missing column(s) for {', '.join(missing)} in header {list(header)}")
+    return roles
+
+
+def _xlsx_chunks(filepath, chunk_rows):
+    wb = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        roles = resolve_columns(header)
+        positions = {role: list(header).index(name) for role, name in roles.items()}
+        batch = []
+        for row in rows:
+            batch.append([row[idx] if idx < len(row) else None for idx in positions.values()])
+            if len(batch) >= chunk_rows:
+                yield pd.DataFrame(batch, columns=list(positions))
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=list(positions))
+    finally:
+        wb.close()
+
+
+def _csv_chunks(filepath, chunk_rows):
+    header = pd.read_csv(filepath, nrows=0).columns
+    roles = resolve_columns(header)
+    dtypes = {name: 'string' for role, name in roles.items() if role not in ('quantity', 'amount')}
+    reader = pd.read_csv(filepath, usecols=list(roles.values()), dtype=dtypes, chunksize=chunk_rows)
+    rename = {name: role for role, name in roles.items()}
+    for chunk in reader:
+        yield chunk.rename(columns=rename)
+
+
+def iter_order_chunks(filepath, chunk_rows=INGEST_CHUNK_ROWS):
+    """Yield the order lines of a CSV or xlsx export as frames of at most
+    chunk_rows rows, with columns renamed to their RAW_COLUMNS roles and
+    compact dtypes: dates normalised to the day, amounts and quantities as
+    float64, product and payment method as categories."""
+    chunks = _xlsx_chunks if filepath.lower().endswith(('.xlsx', '.xlsm')) else _csv_chunks
+    for chunk in chunks(filepath, chunk_rows):
+        chunk['date'] = parse_dates(chunk['date']).dt.normalize()
+        chunk['amount'] = pd.to_numeric(chunk['amount'], errors='coerce').fillna(0.0)
+        chunk['order_id'] = chunk['order_id'].astype('string')
+        chunk['customer'] = chunk['customer'].astype('string')
+        if 'quantity' in chunk:
+            chunk['quantity'] = pd.to_numeric(chunk['quantity'], errors='coerce').fillna(0.0)
+        for role in ('product', 'payment'):
+            if role in chunk:
+                chunk[role] = chunk[role].astype('string').str.strip().astype('category')
+        yield chunk.dropna(subset=['order_id', 'date'])
+
+
+def _order_partials(chunk):
+    """Collapse order lines to one row per order."""
+    agg = {'date': ('date', 'min'), 'customer': ('customer', 'first'), 'amount': ('amount', 'sum')}
+    if 'payment' in chunk:
+        agg['payment'] = ('payment', 'first')
+    return chunk.groupby('order_id', sort=False, observed=True).agg(**agg)
+
+
+def _merge_partials(partials):
+    orders = pd.concat(partials)
+    agg = {'date': 'min', 'customer': 'first', 'amount': 'sum'}
+    if 'payment' in orders:
+        agg['payment'] = 'first'
+    return orders.groupby(level=0, sort=False).agg(agg)
+
+
+def scan_orders(filepath, chunk_rows=INGEST_CHUNK_ROWS):
+    """Single streaming pass over an order-line export.
+    Returns (orders, products): orders has one row per order id (date,
+    customer, amount, payment if present), products the quantity per
+    (month, product), month being a Period."""
+    partials = []
+    products = None
+    for chunk in iter_order_chunks(filepath, chunk_rows):
+        partials.append(_order_partials(chunk))
+        if len(partials) >= _MERGE_EVERY:
+            partials = [_merge_partials(partials)]
+        if 'product' in chunk and 'quantity' in chunk:
+            month = chunk['date'].dt.to_period('M').rename('month')
+            grouped = chunk.groupby([month, chunk['product']], observed=True)['quantity'].sum()
+            products = grouped if products is None else products.add(grouped, fill_value=0)
+    if not partials:
+        raise ValueError(f'No order lines found in {filepath}')
+    orders = _merge_partials(partials)
+    orders['month'] = orders['date'].dt.to_period('M')
+    return orders, products
+
+
+def mark_new_orders(orders, known_first=None):
+    """Flag each customer's first order (earliest date, then order id) as new.
+    known_first (customer -> first order date, e.g. from the cohort index)
+    marks customers who already ordered before as returning."""
+    first = orders.reset_index(names='order_id').sort_values(['customer', 'date', 'order_id'])
+    first = first.loc[~first['customer'].duplicated(), 'order_id']
+    new = orders.index.isin(first)
+    if known_first is not None and len(known_first):
+        earlier = orders['customer'].map(known_first) < orders['date']
+        new &= ~earlier.fillna(False).to_numpy(dtype=bool)
+    return new
+
+
+def month_kpis(orders):
+    """KPI sheet (KPI, Value) for the orders of one month."""
+    total = len(orders)
+    new = int(orders['new'].sum())
+    turnover = float(orders['amount'].sum())
+    return pd.DataFrame({
+        'KPI': ['Total Orders', 'New Orders', 'Old Orders', 'Turnover', 'Average Basket Value', 'Retention Rate'],
+        'Value': [total, new, total - new, turnover, turnover / total if total else 0.0,
+                  (total - new) / total * 100 if total else 0.0],
+    })
+
+
+def daily_metrics(orders):
+    """Orders, turnover and basket value per day of one month."""
+    daily = orders.groupby('date').agg(orders=('amount', 'size'), turnover=('amount', 'sum'))
+    daily['abv'] = daily['turnover'] / daily['orders']
+    daily.index = daily.index.strftime('%d-%m-%Y')
+    return daily.rename_axis('Date').reset_index()
+
+
+def payment_grid(orders, period):
+    """Calendar grid of payment method counts in the layout parse_payment_grid
+    reads: a title, weekday names, then per week a row of day numbers and a
+    row of "<method>: <count>" cells."""
+    counts = orders.groupby([orders['date'].dt.day, 'payment'], observed=True).size().unstack(fill_value=0)
+    methods = list(counts.columns)
+    weeks = calendar.Calendar(firstweekday=6).monthdayscalendar(period.year, period.month)
+    rows = [[f'{calendar.month_name[period.month]} {period.year}'] + [None] * 6,
+            [calendar.day_name[(idx + 6) % 7].upper() for idx in range(7)]]
+    for week in weeks:
+        rows.append([day or None for day in week])
+        rows.append(['\n'.join(f'{method}: {int(counts.at[day, method]) if day in counts.index else 0}'
+                               for method in methods) if day else None for day in week])
+    return pd.DataFrame(rows)
+
+
+def month_folder_name(period):
+    return f'{calendar.month_abbr[period.month].upper()}_{period.year}'
+
+
+def _write_excel(df, path, header=True):
+    # Dot-prefixed so the month registry ignores the half-written file
+    tmp = os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.tmp.xlsx')
+    df.to_excel(tmp, index=False, header=header)
+    os.replace(tmp, path)
+
+
+def write_month(base_path, folder, orders, products=None, gap=None):
+    """Write the sheets the dashboard reads for one month into
+    base_path/folder. Returns the paths written."""
+    period = orders['month'].iloc[0]
+    month_path = os.path.join(base_path, folder)
+    os.makedirs(month_path, exist_ok=True)
+    prefix = os.path.join(month_path, folder.lower())
+    daily = daily_metrics(orders)
+    written = []
+
+    def write(df, path, header=True):
+        _write_excel(df, path, header)
+        written.append(path)
+
+    write(month_kpis(orders), f'{prefix}_kpi_cards.xlsx')
+    write(daily[['Date', 'orders']].rename(columns={'orders': 'Total Orders'}), f'{prefix}_orders.xlsx')
+    write(daily[['Date', 'abv']].rename(columns={'abv': 'Average Basket Value'}), f'{prefix}_abv.xlsx')
+    write(daily[['Date', 'turnover']].rename(columns={'turnover': 'Daily Turnover'}), f'{prefix}_turnover.xlsx')
+    if products is not None and period in products.index.get_level_values('month'):
+        items = products.xs(period, level='month').rename_axis('Product').rename('Quantity').reset_index()
+        write(items[items['Quantity'] != 0], os.path.join(month_path, 'product_quantities.xlsx'))
+    if 'payment' in orders:
+        write(payment_grid(orders, period), f'{prefix}_payment_method.xlsx', header=False)
+    if gap is not None and not gap.empty:
+        write(gap, f'{prefix}_purchasing_gap.xlsx')
+    return written
+
+
+def ingest_orders(filepath, base_path, chunk_rows=INGEST_CHUNK_ROWS, folder=None, index=None):
+    """Build month folders under base_path from an order-line export.
+    Orders are split by calendar month into MON_YYYY folders (or folder,
+    when the export covers a single month). Each month's customers are
+    added to index (the base path's cohort index by default), which decides
+    whether an order is new and provides the purchasing gap sheet; pass
+    index=False to skip it, in which case a customer's first order in the
+    export counts as new. Returns {folder: [paths written]}."""
+    orders, products = scan_orders(filepath, chunk_rows)
+    months = sorted(orders['month'].unique())
+    if folder is not None and len(months) > 1:
+        raise ValueError(f'{filepath} covers {len(months)} months; folder can only name one')
+    if index is None:
+        index = get_index(base_path)
+    orders['new'] = mark_new_orders(orders, index.first_orders() if index else None)
+    written = {}
+    for period in months:
+        name = folder or month_folder_name(period)
+        month_orders = orders[orders['month'] == period]
+        gap = None
+        if index:
+            index.apply_month(name, period, customer_activity(month_orders))
+            gap = index.purchasing_gap([name])
+        written[name] = write_month(base_path, name, month_orders, products, gap)
+    return written
+
+
+if __name__ == '__main__':
+    # Usage: python ingest.py ORDERS_FILE [BASE_PATH] [--folder=NAME] [--chunk-rows=N]
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if not args:
+        print('Usage: python ingest.py ORDERS_FILE [BASE_PATH] [--folder=NAME] [--chunk-rows=N]')
+        sys.exit(2)
+    base_path = args[1] if len(args) > 1 else os.path.dirname(os.path.abspath(__file__))
+    result = ingest_orders(args[0], base_path, int(options.get('chunk-rows', INGEST_CHUNK_ROWS)),
+                           options.get('folder'))
+    for name, paths in result.items():
+        print(f'{name}:')
+        for path in paths:
+            print(f'  - {os.path.basename(path)}')
@@ -0,0 +1,337 @@
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+import numpy as np
+
+from synthetic_data import DEFAULTS, parse_options, write_dataset
+
+# Usage: python load_test.py [BASE_PATH] [--sessions=8] [--switches=20] [--views=ALL,NOV,DEC,JAN]
+#                            [--think-ms=0] [--store=NAME] [--warm] [--port=N] [--output=PATH]
+#        python load_test.py --synthetic [--months=N] [--days=N] [--products=N] [--stores=N] [...]
+# Starts the dashboard with serve.py (as the Procfile does) on BASE_PATH in
+# a child process and connects N concurrent sessions to it over Streamlit's
+# websocket, like N browser tabs. Each session loads the page, then switches
+# between views (ALL and every month by default) as fast as the server
+# answers, or with --think-ms between switches. Reports p50/p95 rerun
+# latency, and the server's CPU time and peak RSS overall and per session;
+# with --output, also as JSON. With --warm, one session visits every view
+# before the timed run, so it measures warm caches rather than a cold start.
+# The server reads its DASHBOARD_* settings from this environment, so runs
+# with different settings can be compared. --synthetic runs against a
+# generated dataset (see synthetic_data.py) in a temporary folder.
+
+SERVE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'serve.py')
+RANGE_VIEW = 'Date range'
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Server:
+    """serve.py in a child process, with its CPU time and resident memory
+    read from /proc (Linux only; elsewhere they are reported as None)."""
+
+    def __init__(self, base_path, port, log_path):
+        self.port = port
+        self._log = open(log_path, 'w')
+        self.process = subprocess.Popen(
+            [sys.executable, SERVE, f'--server.port={port}', '--server.headless=true',
+             '--server.fileWatcherType=none', '--browser.gatherUsageStats=false'],
+            cwd=base_path, stdout=self._log, stderr=subprocess.STDOUT)
+
+    def wait_ready(self, timeout=120):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'Server exited with code {self.process.returncode}; see {self._log.name}')
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{self.port}/_stcore/health', timeout=1)
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError(f'Server not ready after {timeout}s; see {self._log.name}')
+
+    def _status(self, field):
+        try:
+            with open(f'/proc/{self.process.pid}/status') as f:
+                for line in f:
+                    if line.startswith(f'{field}:'):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        return None
+
+    def rss_mb(self):
+        return self._status('VmRSS')
+
+    def peak_rss_mb(self):
+        return self._status('VmHWM')
+
+    def reset_peak(self):
+        """Start the peak RSS over from the current RSS, so that it covers
+        the test and not the imports and warm-up before it."""
+        try:
+            with open(f'/proc/{self.process.pid}/clear_refs', 'w') as f:
+                f.write('5')
+        except OSError:
+            pass
+
+    def cpu_s(self):
+        try:
+            with open(f'/proc/{self.process.pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self._log.close()
+
+
+class Session:
+    """One browser tab: a websocket to the server that asks for script runs
+    with the given widget values and reads the page until the run ends."""
+
+    def __init__(self, port, timeout):
+        from websockets.sync.client import connect
+
+        self.timeout = timeout
+        self.ws = connect(f'ws://127.0.0.1:{port}/_stcore/stream', subprotocols=['streamlit'],
+                          max_size=None, open_timeout=timeout)
+        self.values = {}
+        self.selectboxes = {}
+
+    def run(self, **changes):
+        """Rerun with selectboxes (by label) set to new values; returns the
+        errors shown on the page."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        for label, value in changes.items():
+            if label not in self.selectboxes:
+                raise LookupError(f'No {label!r} selectbox on the page')
+            self.values[label] = value
+        msg = BackMsg()
+        msg.rerun_script.query_string = ''
+        for label, value in self.values.items():
+            widget = msg.rerun_script.widget_states.widgets.add()
+            widget.id = self.selectboxes[label][0]
+            widget.string_value = value
+        self.ws.send(msg.SerializeToString())
+        errors = []
+        while True:
+            fwd = ForwardMsg()
+            fwd.ParseFromString(self.ws.recv(timeout=self.timeout))
+            kind = fwd.WhichOneof('type')
+            if kind == 'delta' and fwd.delta.WhichOneof('type') == 'new_element':
+                element = fwd.delta.new_element
+                if element.WhichOneof('type') == 'selectbox':
+                    self.selectboxes[element.selectbox.label] = (element.selectbox.id, list(element.selectbox.options))
+                elif element.WhichOneof('type') == 'exception':
+                    errors.append(element.exception.message)
+            elif kind == 'script_finished':
+                if fwd.script_finished != ForwardMsg.FINISHED_SUCCESSFULLY:
+                    errors.append(f'run ended with status {fwd.script_finished}')
+                return errors
+
+    def options(self, label):
+        return self.selectboxes[label][1]
+
+    def __enter__(self):
+        self.ws.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self.ws.__exit__(*exc)
+
+
+def run_session(idx, port, views, switches, think_s, store, timeout, start, result):
+    """A first page load, then switches view changes, each session starting
+    at a different view."""
+    runs, errors = [], []
+
+    def timed(view, **changes):
+        started = time.perf_counter()
+        errors.extend(f'{view}: {error}' for error in session.run(**changes))
+        runs.append({'view': view, 'ms': (time.perf_counter() - started) * 1000})
+
+    start.wait()
+    try:
+        with Session(port, timeout) as session:
+            timed('first load')
+            if store:
+                timed(store, Store=store)
+            for step in range(switches):
+                view = views[(idx + step + 1) % len(views)]
+                if think_s:
+                    time.sleep(think_s)
+                timed(view, **{'Select Month': view})
+    except Exception as e:
+        errors.append(f'{type(e).__name__}: {e}')
+    result.update(runs=runs, errors=errors)
+
+
+def discover_views(port, store, timeout):
+    """ALL and every month, from the month selector of a first page load."""
+    with Session(port, timeout) as session:
+        session.run()
+        if store:
+            session.run(Store=store)
+        return [view for view in session.options('Select Month') if view != RANGE_VIEW]
+
+
+def warm_up(port, views, store, timeout):
+    with Session(port, timeout) as session:
+        session.run()
+        if store:
+            session.run(Store=store)
+        for view in views:
+            session.run(**{'Select Month': view})
+
+
+def _percentiles(values):
+    if not values:
+        return {'p50_ms': None, 'p95_ms': None, 'max_ms': None}
+    p50, p95 = np.percentile(values, [50, 95])
+    return {'p50_ms': round(float(p50), 1), 'p95_ms': round(float(p95), 1), 'max_ms': round(max(values), 1)}
+
+
+def _round(value, digits=1):
+    return round(value, digits) if value is not None else None
+
+
+def load_test(base_path, sessions=8, switches=20, views=None, think_ms=0, store=None, warm=False,
+              port=None, timeout=120):
+    """Serve base_path, run the sessions against it and return the results."""
+    port = port or _free_port()
+    log_path = os.path.join(tempfile.gettempdir(), f'dashboard-load-{port}.log')
+    server = Server(base_path, port, log_path)
+    try:
+        server.wait_ready(timeout)
+        views = views or discover_views(port, store, timeout)
+        if warm:
+            warm_up(port, views, store, timeout)
+        server.reset_peak()
+        rss_before = server.rss_mb()
+        cpu_before = server.cpu_s()
+        start = threading.Barrier(sessions + 1)
+        results = [{} for _ in range(sessions)]
+        threads = [threading.Thread(target=run_session, name=f'session-{idx}',
+                                    args=(idx, port, views, switches, think_ms / 1000, store, timeout, start,
+                                          results[idx]))
+                   for idx in range(sessions)]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        wall_s = time.perf_counter() - started
+        cpu_after = server.cpu_s()
+        peak = server.peak_rss_mb()
+    finally:
+        server.stop()
+
+    cpu_s = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+    first = [run['ms'] for result in results for run in result['runs'][:1]]
+    reruns = [run['ms'] for result in results for run in result['runs'][1:]]
+    per_view = {}
+    for result in results:
+        for run in result['runs'][1:]:
+            per_view.setdefault(run['view'], []).append(run['ms'])
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'settings': {key: value for key, value in sorted(os.environ.items()) if key.startswith('DASHBOARD_')},
+        'sessions': sessions,
+        'switches': switches,
+        'views': views,
+        'think_ms': think_ms,
+        'warm': warm,
+        'wall_s': round(wall_s, 2),
+        'reruns_per_s': round(len(reruns) / wall_s, 2) if wall_s else None,
+        'first_load': _percentiles(first),
+        'rerun': _percentiles(reruns),
+        'per_view': {view: _percentiles(values) for view, values in per_view.items()},
+        'session_rerun_p95_ms': [_percentiles([run['ms'] for run in result['runs'][1:]])['p95_ms']
+                                 for result in results],
+        'cpu_s': _round(cpu_s, 2),
+        'cpu_s_per_session': _round(cpu_s / sessions if cpu_s is not None else None, 3),
+        'cpu_ms_per_run': _round(cpu_s * 1000 / max(1, len(first) + len(reruns)) if cpu_s is not None else None),
+        'cores_busy': _round(cpu_s / wall_s if cpu_s is not None and wall_s else None, 2),
+        'rss_before_mb': _round(rss_before),
+        'peak_rss_mb': _round(peak),
+        'peak_rss_mb_per_session': _round((peak - rss_before) / sessions
+                                          if peak is not None and rss_before is not None else None),
+        'errors': [error for result in results for error in result['errors']],
+        'server_log': log_path,
+    }
+
+
+def report(results):
+    print(f"{results['sessions']} sessions x {results['switches']} switches over {', '.join(results['views'])} "
+          f"in {results['wall_s']}s ({results['reruns_per_s']} reruns/s)")
+    for name in ('first_load', 'rerun'):
+        stats = results[name]
+        print(f"  {name:<12} p50 {stats['p50_ms']}ms  p95 {stats['p95_ms']}ms  max {stats['max_ms']}ms")
+    for view, stats in results['per_view'].items():
+        print(f"    {view:<12} p50 {stats['p50_ms']}ms  p95 {stats['p95_ms']}ms")
+    print(f"  server CPU {results['cpu_s']}s ({results['cpu_s_per_session']}s per session, "
+          f"{results['cpu_ms_per_run']}ms per run, {results['cores_busy']} cores busy)")
+    print(f"  server RSS {results['rss_before_mb']} MB before, peak {results['peak_rss_mb']} MB "
+          f"({results['peak_rss_mb_per_session']} MB per session)")
+    for error in results['errors'][:10]:
+        print(f'  ! {error}')
+    if results['errors']:
+        print(f"  {len(results['errors'])} errors; server log in {results['server_log']}")
+
+
+if __name__ == '__main__':
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    flags = {arg[2:] for arg in sys.argv[1:] if arg.startswith('--') and '=' not in arg}
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    store = options.get('store')
+    synthetic_path = None
+    if 'synthetic' in flags:
+        base_path = synthetic_path = tempfile.mkdtemp(prefix='dashboard-load-')
+        config = dict(DEFAULTS, **parse_options(sys.argv[1:]))
+        write_dataset(base_path, **config)
+        if config['stores'] and store is None:
+            store = 'STORE_01'
+    else:
+        base_path = os.path.abspath(args[0] if args else os.path.dirname(os.path.abspath(__file__)))
+    try:
+        results = load_test(base_path, sessions=int(options.get('sessions', 8)),
+                            switches=int(options.get('switches', 20)),
+                            views=options['views'].split(',') if options.get('views') else None,
+                            think_ms=float(options.get('think-ms', 0)), store=store, warm='warm' in flags,
+                            port=int(options['port']) if 'port' in options else None,
+                            timeout=float(options.get('timeout', 120)))
+    finally:
+        if synthetic_path:
+            shutil.rmtree(synthetic_path, ignore_errors=True)
+    report(results)
+    if 'output' in options:
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {options['output']}")
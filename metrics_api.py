@@ -0,0 +1,353 @@
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from aggregate_store import get_store
+from data_loader import enable_copy_on_write
+from month_registry import get_registry, store_paths
+from network import NETWORK, NetworkStore, get_network
+
+# Usage: python metrics_api.py [BASE_PATH] [--port=8502] [--host=127.0.0.1] [--startup-timeout=300]
+# Serves the monthly aggregates of the ALL view as JSON, for tools that would
+# otherwise scrape the dashboard or read the xlsx files themselves:
+#   GET /api/months                                  months (and stores)
+#   GET /api/kpis?months=NOV,DEC                     every KPI per month
+#   GET /api/top-products?months=NOV,DEC&limit=10    combined top products
+#   GET /api/payments?months=NOV,DEC                 orders per payment method
+# months defaults to every month; in the multi-store layout, store=NAME picks
+# a store (default: the whole network). Responses carry an ETag, honour
+# If-None-Match and are gzipped when the client accepts it. Answers come from
+# the aggregate store, which a background thread syncs with the month folders
+# every DASHBOARD_API_REFRESH seconds, so no request ever waits for an xlsx
+# file to be parsed. With DASHBOARD_API_PORT set, serve.py runs the API next
+# to the dashboard, sharing its caches.
+
+API_PORT = int(os.environ.get('DASHBOARD_API_PORT', '0'))
+API_HOST = os.environ.get('DASHBOARD_API_HOST', '127.0.0.1')
+DEFAULT_PORT = 8502
+# Seconds between syncs of the aggregate stores with the month folders; at
+# least MIN_REFRESH, so the API never stops refreshing or spins.
+MIN_REFRESH = 1
+API_REFRESH = max(MIN_REFRESH, float(os.environ.get('DASHBOARD_API_REFRESH', '5')))
+# Seconds the standalone API waits for its first sync before giving up
+STARTUP_TIMEOUT = 300
+MAX_LIMIT = 1000
+
+# Bodies shorter than this are not worth compressing.
+_GZIP_MIN_BYTES = 512
+_RESPONSE_CACHE_ENTRIES = 256
+
+# stores is {store: (AggregateStore, months)}, with the single store of a
+# single-store layout under None; errors are the LoadErrors of the last sync.
+Snapshot = namedtuple('Snapshot', ['stores', 'months', 'version', 'errors'])
+Response = namedtuple('Response', ['etag', 'body', 'gzipped'])
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _value(value):
+    return None if pd.isna(value) else value
+
+
+def _placeholders(items):
+    return ', '.join('?' * len(items))
+
+
+def _kpis(store, months):
+    if not months:
+        return {}
+    df = store.sql(f'SELECT month, kpi, value FROM month_kpis WHERE month IN ({_placeholders(months)})',
+                   list(months))
+    by_month = {month: {} for month in months}
+    for row in df.to_dict('records'):
+        by_month[row['month']][row['kpi']] = _value(row['value'])
+    return by_month
+
+
+def _payments(df):
+    months = {}
+    for row in df.to_dict('records'):
+        month = row.pop('Month')
+        total = sum(row.values())
+        months[month] = {'orders': row,
+                         'share': {method: round(100 * orders / total, 2) if total else None
+                                   for method, orders in row.items()}}
+    return months
+
+
+def months_view(snapshot, store, months, query):
+    if None in snapshot.stores:
+        return {'months': snapshot.months}
+    return {'months': snapshot.months,
+            'stores': {name: store_months for name, (_, store_months) in snapshot.stores.items()}}
+
+
+def kpis_view(snapshot, store, months, query):
+    """KPI names are lower case, as in the aggregate store. KPIs are not
+    added up over the network (ABV or retention cannot be), so the network
+    answer has each store's KPIs."""
+    if store == NETWORK:
+        return {'store': store, 'stores': {
+            name: _kpis(aggregates, [month for month in months if month in store_months])
+            for name, (aggregates, store_months) in snapshot.stores.items()}}
+    return {'store': store, 'months': _kpis(snapshot.stores[store][0], months)}
+
+
+def top_products_view(snapshot, store, months, query):
+    try:
+        limit = int(query.get('limit', '10'))
+    except ValueError:
+        raise ApiError(400, 'limit must be a number')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ApiError(400, f'limit must be between 1 and {MAX_LIMIT}')
+    df = _source(snapshot, store).top_products(months, limit)
+    return {'store': store, 'months': months,
+            'products': [{'product': row['Product'], 'quantity': _value(row['Quantity'])}
+                         for row in df.to_dict('records')]}
+
+
+def payments_view(snapshot, store, months, query):
+    """Orders per payment method and each method's share (%) of the
+    month's orders."""
+    return {'store': store, 'months': _payments(_source(snapshot, store).payment_totals(months))}
+
+
+ROUTES = {
+    '/api/months': months_view,
+    '/api/kpis': kpis_view,
+    '/api/top-products': top_products_view,
+    '/api/payments': payments_view,
+}
+
+
+def _source(snapshot, store):
+    """AggregateStore of store, or a NetworkStore over every store."""
+    if store == NETWORK:
+        return NetworkStore({name: aggregates for name, (aggregates, _) in snapshot.stores.items()})
+    return snapshot.stores[store][0]
+
+
+def _db_stamp(store):
+    try:
+        stat = os.stat(store.db_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class Metrics:
+    """The aggregate store(s) of base_path, as a snapshot that sync()
+    replaces, and the responses rendered from the current snapshot."""
+
+    def __init__(self, base_path):
+        self.base_path = os.path.abspath(base_path)
+        self.snapshot = None
+        self.ready = threading.Event()
+        # Exception of the last sync, None after a successful one
+        self.error = None
+        self._lock = threading.Lock()
+        self._responses = {}
+        self._responses_version = None
+
+    def sync(self):
+        """Sync the aggregate stores with the month folders (parsing only
+        changed files) and publish the result."""
+        if store_paths(self.base_path):
+            network, months, store_files, errors = get_network(self.base_path)
+            stores = {name: (network.stores[name], list(files)) for name, files in store_files.items()}
+        else:
+            registry = get_registry(self.base_path)
+            all_files = registry.manifest()
+            months = list(all_files)
+            store = get_store(self.base_path)
+            errors = store.sync(all_files)
+            stores = {None: (store, months)}
+        state = [(name, store_months, _db_stamp(aggregates)) for name, (aggregates, store_months) in stores.items()]
+        version = hashlib.sha1(repr((months, state)).encode()).hexdigest()
+        self.snapshot = Snapshot(stores, months, version, errors)
+        self.ready.set()
+        return errors
+
+    def _resolve(self, snapshot, query):
+        store = query.get('store')
+        if None in snapshot.stores:
+            if store is not None:
+                raise ApiError(404, 'There are no stores; drop the store parameter')
+        elif store in (None, NETWORK):
+            store = NETWORK
+        elif store not in snapshot.stores:
+            raise ApiError(404, f"Unknown store {store!r}; stores: {', '.join(snapshot.stores)}")
+        available = snapshot.months if store == NETWORK else snapshot.stores[store][1]
+        if not query.get('months'):
+            return store, list(available)
+        months = [month.strip() for month in query['months'].split(',') if month.strip()]
+        unknown = [month for month in months if month not in available]
+        if unknown:
+            raise ApiError(404, f"Unknown month(s) {', '.join(unknown)}; months: {', '.join(available)}")
+        return store, months
+
+    def response(self, path, query):
+        """Response for a GET of path with query ({name: value}); the same
+        request is answered from memory until the snapshot changes."""
+        view = ROUTES.get(path)
+        if view is None:
+            raise ApiError(404, f"Unknown path {path}; paths: {', '.join(ROUTES)}")
+        snapshot = self.snapshot
+        if snapshot is None:
+            if self.error is not None:
+                raise ApiError(503, f'Loading the aggregates failed: {type(self.error).__name__}: {self.error}')
+            raise ApiError(503, 'The aggregates are still being loaded')
+        key = (path,) + tuple(sorted(query.items()))
+        with self._lock:
+            if self._responses_version != snapshot.version:
+                self._responses = {}
+                self._responses_version = snapshot.version
+            cached = self._responses.get(key)
+        if cached is not None:
+            return cached
+        store, months = self._resolve(snapshot, query)
+        body = json.dumps(view(snapshot, store, months, query), separators=(',', ':')).encode()
+        response = Response(f'"{hashlib.sha1(body).hexdigest()[:20]}"', body,
+                            gzip.compress(body, 6) if len(body) >= _GZIP_MIN_BYTES else None)
+        with self._lock:
+            if self._responses_version == snapshot.version:
+                if len(self._responses) >= _RESPONSE_CACHE_ENTRIES:
+                    self._responses.clear()
+                self._responses[key] = response
+        return response
+
+    def run_sync(self, interval=API_REFRESH):
+        """Sync now, then every interval seconds (at least MIN_REFRESH).
+        A failed sync is logged and kept in error; the last good snapshot
+        stays in use."""
+        while True:
+            try:
+                for err in self.sync():
+                    print(f'  ! {err.path}: {err.error}', file=sys.stderr)
+                self.error = None
+            except Exception as e:
+                self.error = e
+                print(f'Metrics API sync failed: {type(e).__name__}: {e}', file=sys.stderr)
+            time.sleep(max(MIN_REFRESH, interval))
+
+    def wait_ready(self, timeout=STARTUP_TIMEOUT):
+        """Wait for the first successful sync. Raises the sync's exception
+        if it failed before, or TimeoutError after timeout seconds."""
+        deadline = time.monotonic() + timeout
+        while not self.ready.wait(0.1):
+            if self.error is not None:
+                raise self.error
+            if time.monotonic() > deadline:
+                raise TimeoutError(f'The aggregates were not loaded after {timeout:g}s')
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or any(tag.removeprefix('W/') == etag for tag in tags)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    server_version = 'DashboardMetrics/1'
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def _respond(self, send_body):
+        url = urlsplit(self.path)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        metrics = self.server.metrics
+        if url.path == '/health':
+            ready = metrics.snapshot is not None
+            error = f'{type(metrics.error).__name__}: {metrics.error}' if metrics.error is not None else None
+            return self._send(200 if ready else 503, json.dumps({'ready': ready, 'error': error}).encode(),
+                              send_body=send_body)
+        try:
+            response = metrics.response(url.path, query)
+        except ApiError as e:
+            headers = {'Retry-After': '1'} if e.status == 503 else {}
+            return self._send(e.status, json.dumps({'error': str(e)}).encode(), headers, send_body)
+        headers = {'ETag': response.etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+        if _etag_matches(self.headers.get('If-None-Match'), response.etag):
+            return self._send(304, b'', headers, send_body=False)
+        body = response.body
+        if response.gzipped is not None and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = response.gzipped
+            headers['Content-Encoding'] = 'gzip'
+        self._send(200, body, headers, send_body)
+
+    def _send(self, status, body, headers=None, send_body=True):
+        self.send_response(status)
+        if status != 304:
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(base_path, port=DEFAULT_PORT, host=API_HOST):
+    """Threading HTTP server for the API of base_path; its aggregates are
+    not loaded yet (see Metrics.run_sync)."""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    server.metrics = Metrics(base_path)
+    return server
+
+
+def start_api(base_path, port=None, host=API_HOST):
+    """Serve the API of base_path from daemon threads, next to the
+    dashboard. Requests get 503 until the first sync is done. Returns the
+    server, or None when no port is given and DASHBOARD_API_PORT is unset."""
+    port = port or API_PORT
+    if not port:
+        return None
+    server = make_server(base_path, port, host)
+    threading.Thread(target=server.metrics.run_sync, name='metrics-api-sync', daemon=True).start()
+    threading.Thread(target=server.serve_forever, name='metrics-api', daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    base_path = args[0] if args else os.path.dirname(os.path.abspath(__file__))
+    enable_copy_on_write()
+    server = make_server(base_path, int(options.get('port', API_PORT or DEFAULT_PORT)),
+                         options.get('host', API_HOST))
+    threading.Thread(target=server.metrics.run_sync, name='metrics-api-sync', daemon=True).start()
+    try:
+        server.metrics.wait_ready(float(options.get('startup-timeout', STARTUP_TIMEOUT)))
+    except Exception as e:
+        print(f'Could not load the aggregates of {server.metrics.base_path}: {type(e).__name__}: {e}',
+              file=sys.stderr)
+        sys.exit(1)
+    host, port = server.server_address[:2]
+    print(f'Serving {len(server.metrics.snapshot.months)} months of {server.metrics.base_path} '
+          f'on http://{host}:{port}/api/months')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
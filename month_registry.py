@@ -0,0 +1,234 @@
+import calendar
+import fnmatch
+import os
+import re
+import threading
+from collections import namedtuple
+
+from data_loader import MONTH_FILE_PATTERNS
+
+MonthEntry = namedtuple('MonthEntry', ['name', 'path', 'year', 'month', 'files'])
+
+_MONTH_NUMBERS = {}
+for _num in range(1, 13):
+    _MONTH_NUMBERS[calendar.month_name[_num].lower()] = _num
+    _MONTH_NUMBERS[calendar.month_abbr[_num].lower()] = _num
+_MONTH_NUMBERS['sept'] = 9
+
+# NOV, November, NOV_2025, Nov-2025, 2025-11, 2025_NOV, November 2025
+_FOLDER_RE = re.compile(r'^(?:(?P<year1>\d{4})[-_ ]?)?(?P<month>[A-Za-z]+|\d{1,2})(?:[-_ ]?(?P<year2>\d{4}))?$')
+# Year partitions of a store: <STORE>/2025/<MONTH>/
+_YEAR_RE = re.compile(r'^\d{4}$')
+
+# Multi-store layout: base_path/stores/<STORE>/<YEAR>/<MONTH>/. Each store
+# folder is a base path of its own, with its own registry and caches.
+STORES_DIR = os.environ.get('DASHBOARD_STORES_DIR', 'stores')
+
+
+def parse_month_folder(name):
+    """Return (year, month) for a month folder name, or None if it is not one.
+    year is None when the name carries no year."""
+    match = _FOLDER_RE.match(name.strip())
+    if not match:
+        return None
+    year = match.group('year1') or match.group('year2')
+    token = match.group('month')
+    if token.isdigit():
+        # Bare numbers are only months when paired with a year (2025-11)
+        if year is None or not 1 <= int(token) <= 12:
+            return None
+        month = int(token)
+    else:
+        month = _MONTH_NUMBERS.get(token.lower())
+        if month is None:
+            return None
+    return (int(year) if year else None, month)
+
+
+def _yearless_offsets(months):
+    """Place months that carry no year on a timeline. The folders are assumed
+    to cover a contiguous run of at most a year, so the run starts after the
+    largest gap between calendar months (NOV, DEC, JAN -> JAN is next year).
+    Returns {month: year offset (0 or 1)}."""
+    ordered = sorted(set(months))
+    if len(ordered) < 2:
+        return {month: 0 for month in ordered}
+    gaps = [((ordered[(i + 1) % len(ordered)] - ordered[i]) % 12, i) for i in range(len(ordered))]
+    start = (max(gaps)[1] + 1) % len(ordered)
+    first = ordered[start]
+    return {month: 0 if month >= first else 1 for month in ordered}
+
+
+def resolve_month_files(month_path, names=None):
+    """Map each file kind to its file in month_path using MONTH_FILE_PATTERNS,
+    from a single directory listing. Hidden files and Excel lock files are
+    ignored."""
+    if names is None:
+        names = os.listdir(month_path)
+    names = sorted(name for name in names if not name.startswith(('.', '~$')))
+    files = {}
+    for kind, patterns in MONTH_FILE_PATTERNS.items():
+        for pattern in patterns:
+            matches = fnmatch.filter(names, pattern)
+            if matches:
+                files[kind] = os.path.join(month_path, matches[0])
+                break
+    return files
+
+
+def month_label(year, month):
+    """Name of a month partition, e.g. NOV 2025."""
+    return f'{calendar.month_abbr[month].upper()} {year}'
+
+
+class MonthRegistry:
+    """Manifest of the month folders under base_path and their files.
+    Month folders sit either directly in base_path (NOV/, DEC/) or in year
+    partitions (2025/NOV/, named NOV 2025). The folder scan is cached and
+    only redone when the mtime of base_path, a year folder or one of the
+    month folders changes, so lookups cost a few stat calls instead of a
+    glob per file type. months() and manifest() check for changes;
+    month(), files() and file() read the last scan, so callers looping
+    over months stat the folders once, not once per month."""
+
+    def __init__(self, base_path):
+        self.base_path = os.path.abspath(base_path)
+        self.store = store_name(self.base_path)
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._order = []
+        self._year_dirs = []
+        self._stamps = None
+        self.scans = 0
+
+    def _current_stamps(self):
+        stamps = {self.base_path: os.stat(self.base_path).st_mtime_ns}
+        for path in self._year_dirs:
+            try:
+                stamps[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                stamps[path] = None
+        for entry in self._entries.values():
+            try:
+                stamps[entry.path] = os.stat(entry.path).st_mtime_ns
+            except OSError:
+                stamps[entry.path] = None
+        return stamps
+
+    def _scan(self):
+        found = []
+        year_dirs = []
+        with os.scandir(self.base_path) as it:
+            for item in it:
+                if not item.is_dir() or item.name.startswith('.'):
+                    continue
+                if _YEAR_RE.match(item.name):
+                    year_dirs.append(item.path)
+                    with os.scandir(item.path) as months:
+                        for sub in months:
+                            parsed = parse_month_folder(sub.name) if sub.is_dir() else None
+                            if parsed is not None:
+                                # The partition's year wins over one in the folder name
+                                year = int(item.name)
+                                found.append((month_label(year, parsed[1]), sub.path, year, parsed[1]))
+                    continue
+                parsed = parse_month_folder(item.name)
+                if parsed is not None:
+                    found.append((item.name, item.path, parsed[0], parsed[1]))
+        self._year_dirs = year_dirs
+        offsets = _yearless_offsets([month for _, _, year, month in found if year is None])
+        entries = {}
+        for name, path, year, month in found:
+            entries[name] = MonthEntry(name, path, year, month, resolve_month_files(path))
+        # Folders with a year sort by it; yearless ones come first, in their
+        # inferred order.
+        self._order = sorted(entries, key=lambda name: (
+            entries[name].year is not None,
+            entries[name].year if entries[name].year is not None else offsets[entries[name].month],
+            entries[name].month))
+        self._entries = entries
+        self._stamps = self._current_stamps()
+        self.scans += 1
+
+    def refresh(self, force=False):
+        """Rescan if any watched directory changed since the last scan."""
+        with self._lock:
+            if force or self._stamps is None or self._current_stamps() != self._stamps:
+                self._scan()
+
+    def months(self):
+        self.refresh()
+        return list(self._order)
+
+    def manifest(self):
+        """{month: {kind: path}} of every month in order, from one refresh."""
+        self.refresh()
+        with self._lock:
+            return {name: dict(self._entries[name].files) for name in self._order}
+
+    def month(self, name):
+        if self._stamps is None:
+            self.refresh()
+        return self._entries.get(name)
+
+    def files(self, name):
+        entry = self.month(name)
+        return dict(entry.files) if entry else {}
+
+    def file(self, name, kind):
+        entry = self.month(name)
+        return entry.files.get(kind) if entry else None
+
+    def page(self, name):
+        """Figure cache page of a view (a month, ALL, ...) of this registry's
+        store, so stores do not evict each other's charts."""
+        return f'{self.store}/{name}' if self.store else name
+
+
+def stores_root(base_path):
+    return os.path.join(os.path.abspath(base_path), STORES_DIR)
+
+
+def store_name(path):
+    """Name of the store whose folder is path, or None if path is not a
+    store folder of the multi-store layout."""
+    path = os.path.abspath(path)
+    parent = os.path.dirname(path)
+    return os.path.basename(path) if os.path.basename(parent) == STORES_DIR else None
+
+
+def store_state_path(path, base_path):
+    """path of a state database set by an environment override, made
+    per-store when base_path is a store folder (aggregates.sqlite becomes
+    aggregates.KOCHI.sqlite), so stores never share one database."""
+    store = store_name(base_path)
+    if store is None:
+        return os.path.abspath(path)
+    root, ext = os.path.splitext(os.path.abspath(path))
+    return f'{root}.{store}{ext}'
+
+
+def store_paths(base_path):
+    """{store: folder} of the multi-store layout under base_path, sorted by
+    name; empty for a single-store base_path. Listing the stores costs one
+    directory scan and opens nothing inside them."""
+    root = stores_root(base_path)
+    try:
+        with os.scandir(root) as it:
+            stores = {item.name: item.path for item in it if item.is_dir() and not item.name.startswith('.')}
+    except OSError:
+        return {}
+    return dict(sorted(stores.items()))
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(base_path):
+    """Process-wide registry for base_path."""
+    base_path = os.path.abspath(base_path)
+    with _registries_lock:
+        if base_path not in _registries:
+            _registries[base_path] = MonthRegistry(base_path)
+        return _registries[base_path]
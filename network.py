@@ -0,0 +1,84 @@
+import pandas as pd
+
+from aggregate_store import get_store
+from month_registry import get_registry, store_paths
+
+# Name of the network-wide view in the store selector and the figure cache
+NETWORK = 'All stores'
+
+
+class NetworkStore:
+    """The aggregate stores of every store in the multi-store layout, read
+    as one. Each query runs against every store's per-month summaries and
+    the small results are combined here, so the network view never loads a
+    raw file that its store has already summarised."""
+
+    def __init__(self, stores):
+        self.stores = stores
+
+    def kpi_by_store(self, kpi, months):
+        """Store, Month and Value of one KPI, stores in name order and
+        months in the order of months."""
+        frames = [store.kpi_by_month(kpi, months).assign(Store=name) for name, store in self.stores.items()]
+        frames = [df for df in frames if not df.empty]
+        if not frames:
+            return pd.DataFrame(columns=['Store', 'Month', 'Value'])
+        return pd.concat(frames, ignore_index=True)[['Store', 'Month', 'Value']]
+
+    def kpi_by_month(self, kpi, months):
+        """One KPI summed over the stores per month, so only for additive
+        KPIs such as Total Orders or Turnover."""
+        df = self.kpi_by_store(kpi, months)
+        if df.empty:
+            return pd.DataFrame(columns=['Month', 'Value'])
+        summed = df.groupby('Month')['Value'].sum()
+        return summed.reindex([month for month in months if month in summed.index]).rename_axis('Month').reset_index()
+
+    def top_products(self, months, limit=10):
+        frames = [store.top_products(months, None) for store in self.stores.values()]
+        frames = [df for df in frames if not df.empty]
+        if not frames:
+            return pd.DataFrame(columns=['Product', 'Quantity'])
+        combined = pd.concat(frames).groupby('Product', as_index=False)['Quantity'].sum()
+        return combined.sort_values(['Quantity', 'Product'], ascending=[False, True]).head(limit).reset_index(drop=True)
+
+    def purchasing_gap(self, months):
+        """Mean percentage per bucket over every store's months."""
+        frames = [df for df in (store.purchasing_gap_sums(months) for store in self.stores.values()) if not df.empty]
+        if not frames:
+            return pd.DataFrame(columns=['Purchasing Gap', 'Percentage'])
+        sums = pd.concat(frames).groupby('Purchasing Gap', as_index=False)[['Sum', 'Count']].sum()
+        sums = sums[sums['Count'] > 0]
+        return pd.DataFrame({'Purchasing Gap': sums['Purchasing Gap'],
+                             'Percentage': sums['Sum'] / sums['Count']}).reset_index(drop=True)
+
+    def payment_totals(self, months):
+        """Orders per payment method and month, summed over the stores."""
+        frames = [df for df in (store.payment_totals(months) for store in self.stores.values()) if not df.empty]
+        if not frames:
+            return pd.DataFrame(columns=['Month'])
+        combined = pd.concat(frames, ignore_index=True)
+        methods = list(dict.fromkeys(method for df in frames for method in df.columns if method != 'Month'))
+        summed = combined.groupby('Month')[methods].sum().astype('int64')
+        summed = summed.reindex([month for month in months if month in summed.index])
+        return summed.rename_axis(index='Month').reset_index()
+
+
+def get_network(base_path):
+    """NetworkStore over every store under base_path, each store's
+    aggregates synced with its month folders first (re-summarising only
+    changed files). Returns (network, months, store_files, errors): months
+    of all stores in calendar order, store_files as {store: {month: {kind:
+    path}}} and errors as (store, LoadError) pairs."""
+    stores, store_files, errors, periods = {}, {}, [], {}
+    for name, path in store_paths(base_path).items():
+        registry = get_registry(path)
+        store_files[name] = registry.manifest()
+        stores[name] = get_store(path)
+        errors += [(name, err) for err in stores[name].sync(store_files[name])]
+        for month in store_files[name]:
+            entry = registry.month(month)
+            if entry is not None:
+                periods.setdefault(month, (entry.year or 0, entry.month))
+    months = sorted(periods, key=periods.get)
+    return NetworkStore(stores), months, store_files, errors
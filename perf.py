@@ -0,0 +1,110 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from datetime import datetime, timezone
+
+# Instrumentation is off unless DASHBOARD_PERF is set (or the sidebar toggle
+# is switched on). Events are appended as JSON lines to DASHBOARD_PERF_LOG,
+# by default .dashboard/perf.jsonl under the data folder.
+PERF_ENABLED = os.environ.get('DASHBOARD_PERF', '0') not in ('', '0')
+PERF_LOG = os.environ.get('DASHBOARD_PERF_LOG')
+
+_current = contextvars.ContextVar('dashboard_perf_run', default=None)
+# Returned by timer() while no run is active: entering it costs next to
+# nothing and the dict it yields is simply discarded.
+_NULL_TIMER = nullcontext({})
+_log_lock = threading.Lock()
+
+
+class PerfRun:
+    """Timing events and counters collected during one script run."""
+
+    def __init__(self, page):
+        self.id = uuid.uuid4().hex[:12]
+        self.page = page
+        self.started = time.perf_counter()
+        self.elapsed_ms = None
+        self.events = []
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._token = None
+
+    def add(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+
+class _Timer:
+    __slots__ = ('run', 'event', 'start')
+
+    def __init__(self, run, stage, name, fields):
+        self.run = run
+        self.event = dict(stage=stage, name=name, **fields)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self.event
+
+    def __exit__(self, exc_type, exc, tb):
+        self.event['ms'] = round((time.perf_counter() - self.start) * 1000, 3)
+        if exc_type is not None:
+            self.event['error'] = exc_type.__name__
+        self.run.add(self.event)
+        return False
+
+
+def timer(stage, name, **fields):
+    """Context manager timing one step (stage is e.g. 'read', 'parse',
+    'transform', 'figure' or 'section'). It yields the event dict, so the
+    caller can add fields such as rows. A no-op outside an active run."""
+    run = _current.get()
+    if run is None:
+        return _NULL_TIMER
+    return _Timer(run, stage, name, fields)
+
+
+def count(name, n=1):
+    """Add n to a counter of the active run, if any."""
+    run = _current.get()
+    if run is not None:
+        run.count(name, n)
+
+
+def active():
+    return _current.get() is not None
+
+
+def start_run(page):
+    """Start collecting events in this context (and in contexts copied from
+    it, e.g. by load_months' worker threads)."""
+    run = PerfRun(page)
+    run._token = _current.set(run)
+    return run
+
+
+def finish_run(run, log_path=None):
+    """Stop collecting and append the run's events to log_path."""
+    run.elapsed_ms = round((time.perf_counter() - run.started) * 1000, 3)
+    _current.reset(run._token)
+    if log_path:
+        write_log(run, log_path)
+    return run
+
+
+def write_log(run, log_path):
+    """Append one JSON line per event plus a 'run' summary line."""
+    stamp = datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+    base = {'run': run.id, 'ts': stamp, 'page': run.page}
+    lines = [json.dumps(dict(base, **event), default=str) for event in run.events]
+    lines.append(json.dumps(dict(base, stage='run', name='total', ms=run.elapsed_ms, counts=run.counts)))
+    os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+    with _log_lock, open(log_path, 'a', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
@@ -0,0 +1,93 @@
+import os
+import sys
+from collections import namedtuple
+
+from aggregate_store import QUERY_TABLES, get_store
+from month_registry import get_registry
+
+# Usage: python queries.py [BASE_PATH] NAME [PARAM ...] [--csv]
+#        python queries.py [BASE_PATH] --sql="SELECT ..." [--csv]
+#        python queries.py [BASE_PATH] --list
+# Runs a named or an ad-hoc read-only query over the aggregate store's tables
+# (synced from the month folders first) and prints the result. The store's
+# SQL backend is DASHBOARD_SQL_BACKEND.
+
+# Free-form SQL in the app's Ad-hoc Query section is opt-in: every viewer of
+# the dashboard could run it. sql() bounds its time and rows either way.
+CUSTOM_SQL_ENABLED = os.environ.get('DASHBOARD_CUSTOM_SQL', '0') not in ('', '0')
+
+# params are (name, default) pairs; defaults are strings, as typed on the
+# command line or in the app.
+Query = namedtuple('Query', ['name', 'description', 'sql', 'params'])
+
+QUERIES = {query.name: query for query in [
+    Query('product_quantity_by_month', 'Quantity of the products matching a LIKE pattern (any case), per month',
+          'SELECT p.month AS Month, p.product AS Product, p.quantity AS Quantity '
+          'FROM month_products p JOIN months m ON m.month = p.month '
+          'WHERE LOWER(p.product) LIKE LOWER(?) ORDER BY p.product, m.position',
+          (('pattern', '%'),)),
+    Query('top_products_by_month', 'Each month\'s top products by quantity',
+          'SELECT Month, Rank, Product, Quantity FROM ('
+          'SELECT p.month AS Month, m.position, p.product AS Product, p.quantity AS Quantity, '
+          'ROW_NUMBER() OVER (PARTITION BY p.month ORDER BY p.quantity DESC, p.product) AS Rank '
+          'FROM month_products p JOIN months m ON m.month = p.month) ranked '
+          'WHERE Rank <= CAST(? AS INTEGER) ORDER BY position, Rank',
+          (('limit', '5'),)),
+    Query('payment_mix', 'Share of orders per payment method, per month',
+          'SELECT p.month AS Month, p.method AS Method, p.orders AS Orders, '
+          'ROUND(100.0 * p.orders / SUM(p.orders) OVER (PARTITION BY p.month), 2) AS "Share %" '
+          'FROM month_payments p JOIN months m ON m.month = p.month ORDER BY m.position, p.orders DESC',
+          ()),
+    Query('kpi_trend', 'One KPI per month with its change on the month before',
+          'SELECT Month, Value, Value - LAG(Value) OVER (ORDER BY position) AS Change FROM ('
+          'SELECT k.month AS Month, m.position, k.value AS Value '
+          'FROM month_kpis k JOIN months m ON m.month = k.month '
+          'WHERE k.kpi = LOWER(TRIM(?)) AND k.value IS NOT NULL) trend ORDER BY position',
+          (('kpi', 'Total Orders'),)),
+]}
+
+
+def run_query(store, name, *params):
+    """Run QUERIES[name]; missing params take their defaults."""
+    query = QUERIES[name]
+    if len(params) > len(query.params):
+        raise ValueError(f'{name} takes {len(query.params)} parameter(s), got {len(params)}')
+    values = list(params) + [default for _, default in query.params[len(params):]]
+    return store.sql(query.sql, values)
+
+
+def synced_store(base_path):
+    """The aggregate store for base_path, synced with its month folders."""
+    registry = get_registry(base_path)
+    store = get_store(base_path)
+    for err in store.sync(registry.manifest()):
+        print(f'  ! {err.path}: {err.error}', file=sys.stderr)
+    return store
+
+
+if __name__ == '__main__':
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    flags = {arg[2:] for arg in sys.argv[1:] if arg.startswith('--') and '=' not in arg}
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if 'list' in flags:
+        for query in QUERIES.values():
+            params = ' '.join(f'[{name}={default}]' for name, default in query.params)
+            print(f'  - {query.name} {params}\n      {query.description}')
+        print(f"Tables: {', '.join(QUERY_TABLES)}")
+        sys.exit(0)
+    if args and args[0] not in QUERIES and os.path.isdir(args[0]):
+        base_path, args = args[0], args[1:]
+    else:
+        base_path = os.path.dirname(os.path.abspath(__file__))
+    store = synced_store(base_path)
+    if 'sql' in options:
+        df = store.sql(options['sql'])
+    elif args and args[0] in QUERIES:
+        df = run_query(store, args[0], *args[1:])
+    else:
+        sys.exit(f"Give a query name ({', '.join(QUERIES)}) or --sql=\"SELECT ...\"")
+    if 'csv' in flags:
+        df.to_csv(sys.stdout, index=False)
+    else:
+        print(df.to_string(index=False))
+    print(f'{len(df)} row(s), {store.backend} backend', file=sys.stderr)
@@ -0,0 +1,24 @@
+import startup  # first, so the startup report counts from process start
+
+import os
+import sys
+
+# Usage: python serve.py [streamlit run options, e.g. --server.port=8501]
+# Runs the dashboard like `streamlit run app.py`, but starts the cache
+# warm-up (see startup.py) in the same process before the server boots, so
+# the heavy imports and every month's data are ready by the first visit.
+# With DASHBOARD_API_PORT set, the JSON metrics API (see metrics_api.py) is
+# served from the same process on that port.
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+if __name__ == '__main__':
+    startup.start_warmup(os.getcwd())
+    startup.wait_for_imports()
+    import metrics_api
+
+    metrics_api.start_api(os.getcwd())
+    from streamlit.web import cli
+
+    sys.argv = ['streamlit', 'run', APP] + sys.argv[1:]
+    sys.exit(cli.main())
@@ -0,0 +1,205 @@
+import html
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+import plotly
+from plotly.offline import get_plotlyjs
+
+from aggregate_store import get_store
+from cohort_index import get_index
+from figure_cache import figures, source_version
+from month_registry import get_registry
+from views import all_charts, kpi_cards, month_charts
+
+# Usage: python snapshot.py [BASE_PATH] [--out=DIR] [--pages=ALL,NOV,DEC] [--force] [--shared-js]
+# Renders the ALL view and every month view to static HTML pages (index.html
+# and <MONTH>.html) with the KPI cards and the Plotly figures embedded, so
+# closed months can be served by any static file server. A page is only
+# rendered again when one of its source files changes; manifest.json in the
+# output folder records each page's source version. Pages embed plotly.js
+# unless --shared-js is given, in which case they load one plotly.min.js
+# written next to them.
+
+# Bump when the page markup changes, so existing pages are rendered again.
+SNAPSHOT_FORMAT = 1
+MANIFEST = 'manifest.json'
+PLOTLY_JS = 'plotly.min.js'
+TITLE = 'Pantry Monthly Performance Dashboard'
+
+_STYLE = '''
+body { font-family: "Source Sans Pro", sans-serif; margin: 0 auto; max-width: 1400px; padding: 1rem 2rem; color: #31333F; }
+nav a { margin-right: 1rem; color: #31333F; }
+nav a.current { font-weight: bold; text-decoration: none; }
+.cards { display: flex; flex-wrap: wrap; gap: 1rem; margin: 1rem 0; }
+.card { flex: 1 1 10rem; }
+.card .label { font-size: 0.875rem; }
+.card .value { font-size: 2.25rem; }
+.charts { display: grid; grid-template-columns: repeat(auto-fit, minmax(560px, 1fr)); gap: 1rem; }
+.chart h3 { font-weight: 600; margin: 0.5rem 0; }
+.chart .plot { min-height: 450px; }
+.error { color: #7D353B; background: #FFECEC; padding: 0.75rem; border-radius: 0.5rem; }
+.info { color: #004280; background: #E8F2FC; padding: 0.75rem; border-radius: 0.5rem; }
+footer { margin-top: 2rem; font-size: 0.8rem; color: #808495; }
+'''
+
+
+def page_file(page):
+    return 'index.html' if page == 'ALL' else f'{page}.html'
+
+
+def page_href(page):
+    """Link to a page's file; partition names hold spaces (NOV 2025)."""
+    return quote(page_file(page))
+
+
+def _script_json(value):
+    # '<' only occurs inside JSON strings, where < is the same text,
+    # so the spec cannot close the <script> element it sits in.
+    return value.replace('<', '\\u003c')
+
+
+def render_chart(page, chart, idx):
+    """A chart section: the figure JSON from the figure cache and the
+    script plotting it, or the error raised while building it."""
+    title = html.escape(chart.title)
+    try:
+        spec = figures.get_json(page, chart.chart_id, source_version(chart.sources, *chart.extra), chart.build)
+    except Exception as e:
+        return f'<section class="chart"><h3>{title}</h3><p class="error">Error loading {title}: {html.escape(str(e))}</p></section>'
+    if spec is None:
+        return f'<section class="chart"><h3>{title}</h3><p class="info">No data.</p></section>'
+    return (f'<section class="chart"><h3>{title}</h3><div class="plot" id="plot-{idx}"></div>'
+            f'<script type="application/json" id="spec-{idx}">{_script_json(spec)}</script>'
+            f'<script>(function () {{ var spec = JSON.parse(document.getElementById("spec-{idx}").textContent);'
+            f' Plotly.newPlot("plot-{idx}", spec.data, spec.layout, {{responsive: true, displaylogo: false}}); }})();'
+            f'</script></section>')
+
+
+def render_page(page, heading, cards, charts, pages, plotly_tag):
+    nav = ' '.join(f'<a href="{page_href(name)}"{" class=current" if name == page else ""}>{html.escape(name)}</a>'
+                   for name in pages)
+    card_html = ''.join(f'<div class="card"><div class="label">{html.escape(name)}</div>'
+                        f'<div class="value">{html.escape(value)}</div></div>' for name, value in cards)
+    chart_html = '\n'.join(render_chart(page, chart, idx) for idx, chart in enumerate(charts))
+    stamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M UTC')
+    return f'''<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{html.escape(heading)} - {TITLE}</title>
+<style>{_STYLE}</style>
+{plotly_tag}
+</head>
+<body>
+<nav>{nav}</nav>
+<h1>{TITLE}</h1>
+<h2>{html.escape(heading)}</h2>
+<div class="cards">{card_html}</div>
+<div class="charts">
+{chart_html}
+</div>
+<footer>Snapshot generated {stamp}</footer>
+</body>
+</html>
+'''
+
+
+def _write_text(path, text):
+    tmp = os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def _load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def export(base_path, out_dir, pages=None, force=False, shared_js=False):
+    """Render the pages (ALL and/or month names; all of them by default)
+    of the dashboard for base_path into out_dir, skipping pages whose
+    sources are unchanged since the last export. Returns {page: 'written',
+    'unchanged' or 'removed'}; pages of month folders that no longer exist
+    are removed."""
+    registry = get_registry(base_path)
+    all_files = registry.manifest()
+    months = list(all_files)
+    pages = [page for page in (pages or ['ALL'] + months) if page == 'ALL' or page in months]
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = _load_manifest(out_dir)
+    entries = manifest.get('pages', {})
+    cohort = get_index(base_path)
+
+    if shared_js:
+        js_path = os.path.join(out_dir, PLOTLY_JS)
+        if force or manifest.get('plotly') != plotly.__version__ or not os.path.exists(js_path):
+            _write_text(js_path, get_plotlyjs())
+        plotly_tag = f'<script src="{PLOTLY_JS}"></script>'
+    else:
+        plotly_tag = f'<script>{get_plotlyjs()}</script>'
+    # Anything else that changes every page: markup, plotly and navigation
+    common = (SNAPSHOT_FORMAT, plotly.__version__, shared_js, pages)
+
+    store = None
+    result = {}
+    for page in pages:
+        if page == 'ALL':
+            store = store or get_store(base_path)
+            heading = 'Combined Performance - All Months'
+            kpi_file = None
+            charts = all_charts(store, months, all_files, cohort)
+            sources = []
+        else:
+            month_files = all_files[page]
+            heading = f'{page} Performance'
+            kpi_file = month_files.get('kpi')
+            charts = month_charts(month_files)
+            # The retention card may come from the cohort index
+            sources = [kpi_file, cohort.db_path] if kpi_file else []
+        for chart in charts:
+            sources += chart.sources
+        version = source_version(sources, common, *(chart.extra for chart in charts))
+        path = os.path.join(out_dir, page_file(page))
+        if not force and entries.get(page, {}).get('version') == version and os.path.exists(path):
+            result[page] = 'unchanged'
+            continue
+        if page == 'ALL':
+            store.sync(all_files)
+        cards = kpi_cards(page, kpi_file, cohort) if kpi_file else []
+        _write_text(path, render_page(page, heading, cards, charts, pages, plotly_tag))
+        entries[page] = {'file': page_file(page), 'version': version,
+                         'generated': datetime.now(timezone.utc).isoformat(timespec='seconds')}
+        result[page] = 'written'
+
+    # Pages of month folders that have gone away
+    for page in [page for page in entries if page != 'ALL' and page not in months]:
+        try:
+            os.remove(os.path.join(out_dir, entries.pop(page)['file']))
+        except OSError:
+            pass
+        result[page] = 'removed'
+    manifest = {'format': SNAPSHOT_FORMAT, 'plotly': plotly.__version__ if shared_js else manifest.get('plotly'),
+                'pages': entries}
+    _write_text(os.path.join(out_dir, MANIFEST), json.dumps(manifest, indent=2))
+    return result
+
+
+if __name__ == '__main__':
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    flags = {arg[2:] for arg in sys.argv[1:] if arg.startswith('--') and '=' not in arg}
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    base_path = args[0] if args else os.path.dirname(os.path.abspath(__file__))
+    out_dir = options.get('out', os.path.join(base_path, 'snapshot'))
+    pages = options['pages'].split(',') if options.get('pages') else None
+    result = export(base_path, out_dir, pages, force='force' in flags, shared_js='shared-js' in flags)
+    for page, status in result.items():
+        print(f'  - {page_file(page):<20} {status}')
+    print(f'Snapshot in {out_dir}')
@@ -0,0 +1,166 @@
+import importlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Startup times are measured from the first import of this module: by
+# serve.py before the server starts, or by app.py on its first run under a
+# plain `streamlit run`.
+STARTED = time.time()
+# Background warm-up of the heavy imports, data, aggregate and figure
+# caches right after start; DASHBOARD_WARMUP=0 turns it off.
+WARMUP_ENABLED = os.environ.get('DASHBOARD_WARMUP', '1') != '0'
+# Imported first by the warm-up, in this order
+HEAVY_MODULES = ('pandas', 'openpyxl', 'plotly.graph_objects', 'plotly.express', 'plotly.io')
+
+_lock = threading.Lock()
+_write_lock = threading.Lock()
+_phases = []
+_first_render_ms = None
+_warmups = {}
+_imports_done = threading.Event()
+
+
+def _ms_since_start(t=None):
+    return round(((t or time.time()) - STARTED) * 1000, 1)
+
+
+@contextmanager
+def phase(name):
+    """Time one startup step; it is recorded with its offset from start
+    and any error, which is not re-raised."""
+    start = time.time()
+    entry = {'phase': name, 'at_ms': _ms_since_start(start)}
+    try:
+        yield entry
+    except Exception as e:
+        entry['error'] = f'{type(e).__name__}: {e}'
+    entry['ms'] = round((time.time() - start) * 1000, 1)
+    with _lock:
+        _phases.append(entry)
+
+
+def warm(base_path):
+    """Import the heavy modules, then load every month into the data cache,
+    sync the aggregate store and build every page's charts into the figure
+    cache. In the multi-store layout, only the network view is warmed: every
+    store's aggregates are synced and its charts built."""
+    try:
+        with phase('imports'):
+            for name in HEAVY_MODULES:
+                importlib.import_module(name)
+    finally:
+        _imports_done.set()
+    from aggregate_store import get_store
+    from cohort_index import get_index
+    from data_loader import LOADERS, enable_copy_on_write, load_months
+    from month_registry import get_registry, store_paths
+    from network import NETWORK, get_network
+    from views import all_charts, month_charts, network_charts
+
+    enable_copy_on_write()
+    registry = get_registry(base_path)
+    if store_paths(base_path):
+        with phase('aggregates') as entry:
+            network, months, store_files, errors = get_network(base_path)
+            entry['stores'] = len(store_files)
+            entry['errors'] = len(errors)
+        with phase('figures') as entry:
+            entry['charts'] = _build(registry.page(NETWORK), network_charts(network, months, store_files))
+        return
+    all_files = registry.manifest()
+    months = list(all_files)
+    with phase('load') as entry:
+        _, errors = load_months(all_files, tuple(LOADERS))
+        entry['files'] = sum(len(files) for files in all_files.values())
+        entry['errors'] = len(errors)
+    store = get_store(base_path)
+    with phase('aggregates'):
+        store.sync(all_files)
+    with phase('figures') as entry:
+        pages = [(registry.page(month), month_charts(all_files[month])) for month in months]
+        pages.append((registry.page('ALL'), all_charts(store, months, all_files, get_index(base_path))))
+        entry['charts'] = sum(_build(page, charts) for page, charts in pages)
+
+
+def _build(page, charts):
+    """Build charts into the figure cache; returns how many were built."""
+    from figure_cache import cached_figure
+
+    built = 0
+    for chart in charts:
+        try:
+            cached_figure(page, chart.chart_id, chart.sources, chart.build, *chart.extra)
+            built += 1
+        except Exception:
+            # The section shows the error when it is viewed
+            pass
+    return built
+
+
+def report_path(base_path):
+    from aggregate_store import STATE_DIR
+
+    return os.path.join(base_path, STATE_DIR, 'startup.json')
+
+
+def start_warmup(base_path):
+    """Run warm(base_path) in a daemon thread, once per process, and write
+    the startup report when it is done. Returns the thread, or None when
+    DASHBOARD_WARMUP=0."""
+    if not WARMUP_ENABLED:
+        return None
+    base_path = os.path.abspath(base_path)
+    with _lock:
+        if base_path not in _warmups:
+            def run():
+                with phase('warmup'):
+                    warm(base_path)
+                write_report(report_path(base_path))
+            _warmups[base_path] = threading.Thread(target=run, name='dashboard-warmup', daemon=True)
+            _warmups[base_path].start()
+        return _warmups[base_path]
+
+
+def wait_for_imports():
+    """Block until the warm-up has imported HEAVY_MODULES; returns at once
+    when no warm-up was started. Importing one of them (or streamlit, which
+    imports plotly and pandas) in another thread meanwhile is not safe:
+    plotly looks pandas up in sys.modules without the import lock and can
+    find it half-initialised."""
+    with _lock:
+        started = bool(_warmups)
+    if started:
+        _imports_done.wait()
+
+
+def mark_first_render(report_path=None):
+    """Record the end of the first page run; later calls do nothing."""
+    global _first_render_ms
+    with _lock:
+        if _first_render_ms is not None:
+            return
+        _first_render_ms = _ms_since_start()
+    if report_path:
+        write_report(report_path)
+
+
+def report():
+    with _lock:
+        return {
+            'started': datetime.fromtimestamp(STARTED, timezone.utc).isoformat(timespec='milliseconds'),
+            'first_render_ms': _first_render_ms,
+            'phases': [dict(entry) for entry in _phases],
+        }
+
+
+def write_report(path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f'{path}.tmp'
+    with _write_lock:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(report(), f, indent=2)
+        os.replace(tmp, path)
@@ -0,0 +1,159 @@
+import calendar
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from data_loader import PAYMENT_METHODS
+from month_registry import STORES_DIR
+
+# Usage: python synthetic_data.py OUTPUT_DIR [--months=N] [--days=N] [--products=N]
+#                                 [--header-rows=N] [--seed=N] [--stores=N]
+# Writes month folders shaped like the bundled NOV/DEC/JAN ones, for
+# benchmarks and load tests. With --stores, writes the multi-store layout
+# (OUTPUT_DIR/stores/STORE_01/2024/JAN/, ...) with different data per store.
+
+DEFAULTS = {
+    'months': 3,
+    'days': None,  # rows per daily sheet; None = the month's length
+    'products': 200,
+    'header_rows': 3,  # title/blank rows above the ITEMS header
+    'seed': 0,
+    'start_year': 2024,
+    'stores': 0,  # 0 = single-store layout
+}
+
+
+def month_periods(months, start_year=DEFAULTS['start_year']):
+    return [pd.Period(year=start_year + idx // 12, month=idx % 12 + 1, freq='M') for idx in range(months)]
+
+
+def folder_name(period):
+    return f'{calendar.month_abbr[period.month].upper()}_{period.year}'
+
+
+def daily_sheets(period, days, rng):
+    """Orders, ABV and turnover frames for days starting at period."""
+    dates = pd.date_range(period.start_time, periods=days, freq='D')
+    orders = rng.integers(1, 60, days)
+    abv = rng.uniform(150, 600, days).round(2)
+    text_dates = dates.strftime('%d-%m-%Y')
+    return {
+        'orders': pd.DataFrame({'Date': text_dates, 'Total Orders': orders}),
+        'abv': pd.DataFrame({'Date': text_dates, 'Average Basket Value': abv}),
+        'turnover': pd.DataFrame({'Date': text_dates, 'Daily Turnover': (orders * abv).round(0)}),
+    }
+
+
+def kpi_sheet(daily):
+    total = int(daily['orders']['Total Orders'].sum())
+    turnover = float(daily['turnover']['Daily Turnover'].sum())
+    new = total * 2 // 5
+    return pd.DataFrame({
+        'KPI': ['Total Orders', 'New Orders', 'Old Orders', 'Turnover', 'Average Basket Value'],
+        'Value': [total, new, total - new, turnover, turnover / total],
+    })
+
+
+def items_rows(products, header_rows, rng):
+    """ITEMS sheet rows: header_rows of title and blank rows, the header,
+    one row per product (some products twice) and a Grand Total row."""
+    rows = [['Sales Summary Report', None]] + [[None, None]] * max(header_rows - 1, 0)
+    rows = rows[:header_rows]
+    rows.append(['Row Labels', 'Sum of QuantityInvoiced'])
+    names = [f'Product {idx:05d} (500g)' for idx in range(products)]
+    names += [names[idx] for idx in rng.integers(0, products, products // 10)]
+    quantities = rng.integers(1, 80, len(names))
+    rows += [[name, int(qty)] for name, qty in zip(names, quantities)]
+    rows.append(['Grand Total', int(quantities.sum())])
+    return rows
+
+
+def payment_grid_rows(period, rng, combined=False):
+    """A calendar page of COD/Instamojo counts like the bundled files."""
+    year, month = period.year, period.month
+    rows = [[np.nan] * 8,
+            [np.nan, f'{calendar.month_name[month]} {year}'] + [np.nan] * 5 + [calendar.month_name[month]],
+            [np.nan] * 7 + [year],
+            [np.nan] * 8,
+            [np.nan, 'SUNDAY', 'MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY']]
+    for week in calendar.Calendar(firstweekday=6).monthdayscalendar(year, month):
+        counts = [[int(rng.integers(0, 40)) for _ in PAYMENT_METHODS] for _ in week]
+        rows.append([np.nan] + [day or np.nan for day in week])
+        rows.append([np.nan] * 8)
+        if combined:
+            rows.append([np.nan] + ['\n'.join(f'{m}: {c}' for m, c in zip(PAYMENT_METHODS, cell)) if day else np.nan
+                                    for day, cell in zip(week, counts)])
+        else:
+            for idx, method in enumerate(PAYMENT_METHODS):
+                rows.append([np.nan] + [f'{method}: {cell[idx]}' if day else np.nan
+                                        for day, cell in zip(week, counts)])
+        rows.append([np.nan] * 8)
+    return rows
+
+
+def gap_sheet(rng):
+    shares = rng.dirichlet(np.ones(3)) * 100
+    return pd.DataFrame({'Purchasing Gap': ['2-5 days', '6-9 days', '10-15 days'], 'Percentage': shares.round(1)})
+
+
+def write_dataset(base_path, months=DEFAULTS['months'], days=DEFAULTS['days'], products=DEFAULTS['products'],
+                  header_rows=DEFAULTS['header_rows'], seed=DEFAULTS['seed'], start_year=DEFAULTS['start_year'],
+                  stores=DEFAULTS['stores']):
+    """Write months synthetic month folders under base_path, or under each
+    of stores store folders. Returns the folder names (relative paths for
+    stores) in order."""
+    if stores:
+        names = []
+        for store in range(1, stores + 1):
+            store_path = os.path.join(base_path, STORES_DIR, f'STORE_{store:02d}')
+            names += [os.path.join(STORES_DIR, f'STORE_{store:02d}', name) for name in
+                      _write_months(store_path, months, days, products, header_rows, seed + store, start_year, True)]
+        return names
+    return _write_months(base_path, months, days, products, header_rows, seed, start_year, False)
+
+
+def _write_months(base_path, months, days, products, header_rows, seed, start_year, partitioned):
+    rng = np.random.default_rng(seed)
+    names = []
+    for idx, period in enumerate(month_periods(months, start_year)):
+        name = folder_name(period)
+        if partitioned:
+            name = os.path.join(str(period.year), calendar.month_abbr[period.month].upper())
+        folder = os.path.join(base_path, name)
+        os.makedirs(folder, exist_ok=True)
+        prefix = os.path.join(folder, folder_name(period).lower())
+        daily = daily_sheets(period, days or period.days_in_month, rng)
+        kpi_sheet(daily).to_excel(f'{prefix}_kpi_cards.xlsx', index=False)
+        for kind, df in daily.items():
+            df.to_excel(f'{prefix}_{kind}.xlsx', index=False)
+        gap_sheet(rng).to_excel(f'{prefix}_purchasing_gap.xlsx', index=False)
+        pd.DataFrame(items_rows(products, header_rows, rng)).to_excel(
+            os.path.join(folder, 'ITEMS.xlsx'), index=False, header=False)
+        pd.DataFrame(payment_grid_rows(period, rng, combined=idx % 3 == 2), dtype=object).to_excel(
+            f'{prefix}_payment_method.xlsx', index=False, header=False)
+        names.append(name)
+    return names
+
+
+def parse_options(argv):
+    """--name=value options as a dict of DEFAULTS keys ('-' read as '_')."""
+    options = {}
+    for arg in argv:
+        if arg.startswith('--') and '=' in arg:
+            key, value = arg[2:].split('=', 1)
+            key = key.replace('-', '_')
+            if key in DEFAULTS:
+                options[key] = int(value)
+    return options
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if not args:
+        print('Usage: python synthetic_data.py OUTPUT_DIR [--months=N] [--days=N] [--products=N] '
+              '[--header-rows=N] [--seed=N] [--stores=N]')
+        sys.exit(2)
+    for name in write_dataset(args[0], **parse_options(sys.argv[1:])):
+        print(f'  - {name}')
@@ -0,0 +1,87 @@
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+import pytest
+
+import aggregate_store
+from aggregate_store import AGGREGATE_KINDS, AggregateStore
+from data_loader import load_months
+from month_registry import MonthRegistry
+from synthetic_data import write_dataset
+
+ENDLESS = 'WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x+1 FROM c) SELECT x FROM c'
+
+
+@pytest.fixture(params=['sqlite', 'duckdb'])
+def store(request, tmp_path):
+    if request.param == 'duckdb':
+        pytest.importorskip('duckdb')
+    return AggregateStore(str(tmp_path / 'aggregates.sqlite'), request.param)
+
+
+def test_sql_returns_at_most_max_rows(store):
+    assert len(store.sql(ENDLESS, max_rows=50)) == 50
+
+
+def test_sql_interrupts_long_queries(store):
+    with pytest.raises(TimeoutError):
+        store.sql(f'SELECT COUNT(*) FROM ({ENDLESS} WHERE x < 1e15)', timeout=0.5)
+
+
+def test_sql_rejects_writes(store):
+    with pytest.raises(ValueError):
+        store.sql('DELETE FROM months')
+
+
+def test_duckdb_copy_is_closed_when_replaced(tmp_path):
+    pytest.importorskip('duckdb')
+    store = AggregateStore(str(tmp_path / 'aggregates.sqlite'), 'duckdb')
+    assert store.sql('SELECT COUNT(*) AS n FROM months')['n'].iloc[0] == 0
+    old = store._duck
+    with closing(sqlite3.connect(store.db_path)) as conn, conn:
+        conn.execute("INSERT INTO months VALUES ('NOV', 0)")
+    assert store.sql('SELECT COUNT(*) AS n FROM months')['n'].iloc[0] == 1
+    assert store._duck is not old
+    with pytest.raises(Exception, match='closed'):
+        old.execute('SELECT 1')
+
+
+def _set_total_orders(path, value):
+    df = pd.read_excel(path)
+    df.loc[df['KPI'] == 'Total Orders', 'Value'] = value
+    df.to_excel(path, index=False)
+
+
+def test_sync_resummarises_only_changed_files(store, tmp_path, monkeypatch):
+    base = tmp_path / 'data'
+    write_dataset(str(base), months=3, products=5)
+    month_files = MonthRegistry(str(base)).manifest()
+    loaded = []
+
+    def recording_load_months(files, kinds):
+        loaded.extend((month, kind) for month, paths in files.items() for kind in paths)
+        return load_months(files, kinds)
+    monkeypatch.setattr(aggregate_store, 'load_months', recording_load_months)
+
+    assert not store.sync(month_files)
+    assert len(loaded) == 3 * len(AGGREGATE_KINDS)
+    loaded.clear()
+    assert not store.sync(month_files)
+    assert loaded == []
+
+    _set_total_orders(month_files['FEB_2024']['kpi'], 12345)
+    assert not store.sync(month_files)
+    assert loaded == [('FEB_2024', 'kpi')]
+    totals = store.kpi_by_month('Total Orders', list(month_files)).set_index('Month')['Value']
+    assert totals['FEB_2024'] == 12345
+
+    # A month no longer listed is dropped without reading anything
+    loaded.clear()
+    del month_files['JAN_2024']
+    assert not store.sync(month_files)
+    assert loaded == []
+    assert list(store.kpi_by_month('Total Orders', ['JAN_2024', 'FEB_2024', 'MAR_2024'])['Month']) == \
+        ['FEB_2024', 'MAR_2024']
+    with closing(sqlite3.connect(store.db_path)) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sources WHERE month = 'JAN_2024'").fetchone() == (0,)
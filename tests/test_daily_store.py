@@ -0,0 +1,73 @@
+import os
+
+import pandas as pd
+
+from daily_store import DailyStore
+from month_registry import MonthRegistry
+from synthetic_data import write_dataset
+from timeseries import DAILY_METRICS, month_daily_frame
+
+
+def _month_files(base_path):
+    return MonthRegistry(str(base_path)).manifest()
+
+
+def test_months_merge_on_one_calendar(tmp_path):
+    write_dataset(str(tmp_path), months=2, products=5)
+    store, errors = DailyStore.from_months(_month_files(tmp_path))
+    assert not errors
+    assert store.first == pd.Timestamp('2024-01-01')
+    assert store.last == pd.Timestamp('2024-02-29')
+    assert len(store) == 31 + 29
+
+
+def test_stray_row_from_the_next_month_does_not_hide_it(tmp_path):
+    write_dataset(str(tmp_path), months=2, products=5)
+    # A total row dated on the next month's first day at the end of JAN's sheets
+    for kind, column in [('orders', 'Total Orders'), ('turnover', 'Daily Turnover'),
+                         ('abv', 'Average Basket Value')]:
+        path = os.path.join(tmp_path, 'JAN_2024', f'jan_2024_{kind}.xlsx')
+        df = pd.read_excel(path)
+        df.loc[len(df)] = ['01-02-2024', 99999]
+        df.to_excel(path, index=False)
+    feb = pd.read_excel(os.path.join(tmp_path, 'FEB_2024', 'feb_2024_orders.xlsx'))
+
+    store, _ = DailyStore.from_months(_month_files(tmp_path))
+    totals = store.totals('2024-02-01', '2024-02-29')
+    assert totals['Days'] == 29
+    assert totals['Total Orders'] == feb['Total Orders'].sum()
+    assert store.slice('2024-02-01', '2024-02-01')['Total Orders'].iloc[0] == feb['Total Orders'].iloc[0]
+    assert store.totals('2024-01-01', '2024-01-31')['Days'] == 31
+
+
+def test_overlapping_months_fill_each_other_gaps(tmp_path):
+    write_dataset(str(tmp_path), months=2, products=5)
+    # FEB's sheet lacks its first day; JAN's sheets carry it instead
+    path = os.path.join(tmp_path, 'FEB_2024', 'feb_2024_orders.xlsx')
+    feb = pd.read_excel(path)
+    feb.iloc[1:].to_excel(path, index=False)
+    path = os.path.join(tmp_path, 'JAN_2024', 'jan_2024_orders.xlsx')
+    jan = pd.read_excel(path)
+    jan.loc[len(jan)] = ['01-02-2024', 7]
+    jan.to_excel(path, index=False)
+
+    store, _ = DailyStore.from_months(_month_files(tmp_path))
+    assert store.slice('2024-02-01', '2024-02-01')['Total Orders'].iloc[0] == 7
+    assert store.totals('2024-02-01', '2024-02-29')['Days'] == 29
+
+
+def test_month_daily_frame_is_shared_until_a_source_changes(tmp_path):
+    write_dataset(str(tmp_path), months=1, products=5)
+    files = _month_files(tmp_path)['JAN_2024']
+    daily, errors = month_daily_frame(files)
+    assert not errors
+    assert list(daily.columns) == list(DAILY_METRICS.values())
+    assert month_daily_frame(files)[0] is daily
+
+    df = pd.read_excel(files['turnover'])
+    df.iloc[:, 1] = 1.0
+    df.to_excel(files['turnover'], index=False)
+    changed, _ = month_daily_frame(files)
+    assert changed is not daily
+    assert (changed['Daily Turnover'] == 1.0).all()
+    pd.testing.assert_series_equal(changed['Total Orders'], daily['Total Orders'])
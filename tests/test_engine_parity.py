@@ -0,0 +1,70 @@
+import itertools
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('python_calamine')
+
+from data_loader import ITEMS_HEADER_SCAN_ROWS, READERS, parse_payment_file
+from excel_engine import iter_rows, read_excel
+from month_registry import MonthRegistry
+
+# The bundled months, read with both engines through the loaders' own
+# readers: the same frames must come out whichever engine is installed.
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MONTH_FILES = [(month, kind, path) for month, files in MonthRegistry(REPO).manifest().items()
+               for kind, path in sorted(files.items())]
+
+
+def _ids(params):
+    return [f'{month}-{kind}' for month, kind, _ in params]
+
+
+def _trimmed(row):
+    row = list(row)
+    while row and row[-1] is None:
+        row.pop()
+    return row
+
+
+def _assert_same(read):
+    calamine, openpyxl = read('calamine'), read('openpyxl')
+    if calamine is None or openpyxl is None:
+        assert calamine is openpyxl
+    else:
+        pd.testing.assert_frame_equal(calamine, openpyxl)
+
+
+def test_bundled_months_are_covered():
+    assert {'NOV', 'DEC', 'JAN'} <= {month for month, _, _ in MONTH_FILES}
+
+
+@pytest.mark.parametrize('month, kind, path', MONTH_FILES, ids=_ids(MONTH_FILES))
+def test_readers_match(month, kind, path):
+    _assert_same(lambda engine: READERS[kind](path, engine=engine))
+
+
+PAYMENT_FILES = [params for params in MONTH_FILES if params[1] == 'payment_method']
+
+
+@pytest.mark.parametrize('month, kind, path', PAYMENT_FILES, ids=_ids(PAYMENT_FILES))
+def test_payment_grid_reads_match(month, kind, path):
+    _assert_same(lambda engine: read_excel(path, engine, header=None))
+    _assert_same(lambda engine: pd.DataFrame(parse_payment_file(path, engine)))
+
+
+ITEMS_FILES = [params for params in MONTH_FILES if params[1] == 'items']
+
+
+@pytest.mark.parametrize('month, kind, path', ITEMS_FILES, ids=_ids(ITEMS_FILES))
+def test_items_header_rows_match(month, kind, path):
+    # The rows read_items_file looks for its header in; engines differ only
+    # in how many empty cells they pad a row with
+    def window(engine):
+        rows = iter_rows(path, engine)
+        try:
+            return [_trimmed(row) for row in itertools.islice(rows, ITEMS_HEADER_SCAN_ROWS)]
+        finally:
+            rows.close()
+    assert window('calamine') == window('openpyxl')
@@ -0,0 +1,92 @@
+import os
+
+import pandas as pd
+import pytest
+
+import data_loader
+from data_loader import FileCache, value_nbytes
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return str(path)
+
+
+def _frame_loader(calls):
+    def load(path):
+        calls.append(path)
+        with open(path) as f:
+            return pd.DataFrame({'value': [float(v) for v in f.read().split()]})
+    return load
+
+
+def test_least_recently_used_entries_are_evicted_by_bytes(tmp_path):
+    paths = [_write(tmp_path / f'{name}.txt', ' '.join(['1'] * 100)) for name in 'abc']
+    calls = []
+    load = _frame_loader(calls)
+    size = value_nbytes(load(paths[0]))
+    cache = FileCache(max_entries=10, max_bytes=2 * size)
+
+    cache.get(paths[0], 'kind', load)
+    cache.get(paths[1], 'kind', load)
+    cache.get(paths[0], 'kind', load)  # a is now the most recently used
+    cache.get(paths[2], 'kind', load)  # evicts b, not a
+    assert len(cache) == 2 and cache.bytes == 2 * size
+    calls.clear()
+    cache.get(paths[0], 'kind', load)
+    cache.get(paths[1], 'kind', load)
+    assert calls == [paths[1]]
+
+    # A value over max_bytes on its own is returned but not kept
+    big = _write(tmp_path / 'big.txt', ' '.join(['1'] * 1000))
+    assert len(cache.get(big, 'kind', load)) == 1000
+    assert cache.bytes <= cache.max_bytes
+    assert not cache.lookup(big, 'kind')[0]
+
+
+def test_changed_file_is_restamped_and_reparsed(tmp_path):
+    path = _write(tmp_path / 'a.txt', '1 2')
+    calls = []
+    cache = FileCache()
+    assert cache.get(path, 'kind', _frame_loader(calls))['value'].sum() == 3
+    assert cache.get(path, 'kind', _frame_loader(calls))['value'].sum() == 3
+    assert len(calls) == 1
+
+    # Same size, only the mtime moves
+    _write(tmp_path / 'a.txt', '5 6')
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert cache.get(path, 'kind', _frame_loader(calls))['value'].sum() == 11
+    assert len(calls) == 2 and len(cache) == 1
+
+
+def test_clear_month_drops_only_that_folder(tmp_path):
+    data_loader.clear_all()
+    calls = []
+    nov = [_write(tmp_path / 'NOV' / f'{kind}.txt', '1') for kind in ('kpi', 'orders')]
+    dec = _write(tmp_path / 'DEC' / 'kpi.txt', '1')
+    for path in nov + [dec]:
+        data_loader.cached(path, 'kind', _frame_loader(calls))
+    try:
+        assert data_loader.clear_month(str(tmp_path / 'NOV')) == 2
+        calls.clear()
+        for path in nov + [dec]:
+            data_loader.cached(path, 'kind', _frame_loader(calls))
+        assert calls == nov
+    finally:
+        data_loader.clear_all()
+
+
+@pytest.mark.parametrize('column', [True, False])
+def test_modifying_a_view_leaves_the_cached_frame_unchanged(tmp_path, column):
+    path = _write(tmp_path / 'a.txt', '1 2 3')
+    cache = FileCache()
+    view = cache.get(path, 'kind', _frame_loader([]))
+    if column:
+        view['value'] *= 10
+    else:
+        view.loc[0, 'value'] = 99
+    view['extra'] = 1
+    pd.testing.assert_frame_equal(cache.get(path, 'kind', _frame_loader([])),
+                                  pd.DataFrame({'value': [1.0, 2.0, 3.0]}))
@@ -0,0 +1,88 @@
+import pandas as pd
+
+from cohort_index import CohortIndex, customer_activity
+from data_loader import parse_payment_file, read_items_file
+from ingest import ingest_orders, scan_orders
+from month_registry import MonthRegistry
+
+# (order id, day, customer, [(product, quantity, line total)], payment)
+ORDERS = [
+    ('1001', '03-01-2024', 'C1', [('Rice', 2, 100.0), ('Dal', 1, 40.0)], 'COD'),
+    ('1002', '03-01-2024', 'C2', [('Rice', 1, 50.0)], 'Instamojo'),
+    ('1003', '15-01-2024', 'C1', [('Oil', 1, 120.0)], 'COD'),
+    ('1004', '20-01-2024', 'C3', [('Dal', 3, 120.0), ('Rice', 1, 50.0), ('Oil', 1, 120.0)], 'COD'),
+    ('1005', '02-02-2024', 'C2', [('Rice', 4, 200.0)], 'COD'),
+    ('1006', '09-02-2024', 'C4', [('Oil', 2, 240.0)], 'Instamojo'),
+    ('1007', '28-02-2024', 'C2', [('Dal', 1, 40.0)], 'Instamojo'),
+    ('1008', '01-03-2024', 'C5', [('Rice', 1, 50.0), ('Dal', 1, 40.0)], 'COD'),
+    ('1009', '12-03-2024', 'C1', [('Oil', 1, 120.0)], 'COD'),
+    ('1010', '30-03-2024', 'C4', [('Rice', 2, 100.0)], 'Instamojo'),
+]
+MONTHS = ['JAN_2024', 'FEB_2024', 'MAR_2024']
+
+
+def _write_export(path):
+    rows = [{'Order ID': order_id, 'Order Date': day, 'Customer ID': customer, 'Product': product,
+             'Quantity': quantity, 'Line Total': total, 'Payment Method': payment}
+            for order_id, day, customer, lines, payment in ORDERS for product, quantity, total in lines]
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+
+def _kpis(month_files):
+    df = pd.read_excel(month_files['kpi'])
+    return dict(zip(df['KPI'], df['Value']))
+
+
+def test_ingest_writes_the_same_months_whatever_the_chunk_size(tmp_path):
+    export = _write_export(tmp_path / 'orders.csv')
+    written = {}
+    for chunk_rows in (2, 1000):
+        base = tmp_path / f'chunks_{chunk_rows}'
+        assert list(ingest_orders(export, str(base), chunk_rows=chunk_rows)) == MONTHS
+        written[chunk_rows] = MonthRegistry(str(base)).manifest()
+    for month in MONTHS:
+        small, large = written[2][month], written[1000][month]
+        assert small.keys() == large.keys()
+        for kind in small:
+            pd.testing.assert_frame_equal(pd.read_excel(small[kind], header=None),
+                                          pd.read_excel(large[kind], header=None))
+
+    months = written[2]
+    # Order lines are collapsed to orders; a customer's first order is new
+    assert _kpis(months['JAN_2024'])['Total Orders'] == 4
+    assert _kpis(months['JAN_2024'])['New Orders'] == 3
+    assert _kpis(months['FEB_2024'])['New Orders'] == 1
+    assert _kpis(months['MAR_2024'])['Old Orders'] == 2
+    assert _kpis(months['JAN_2024'])['Turnover'] == 600.0
+    items = read_items_file(months['JAN_2024']['items'])
+    assert dict(zip(items['Product'], items['Quantity'])) == {'Dal': 4, 'Oil': 2, 'Rice': 4}
+    payments = pd.DataFrame(parse_payment_file(months['FEB_2024']['payment_method']))
+    assert payments[['COD', 'Instamojo']].sum().to_dict() == {'COD': 1, 'Instamojo': 2}
+
+
+def test_cohort_index_incremental_and_rebuilt_agree(tmp_path):
+    orders, _ = scan_orders(_write_export(tmp_path / 'orders.csv'))
+    activity = {name: customer_activity(orders[orders['month'] == period])
+                for name, period in zip(MONTHS, sorted(orders['month'].unique()))}
+    periods = dict(zip(MONTHS, ('2024-01', '2024-02', '2024-03')))
+
+    # In calendar order every month only upserts its customers
+    incremental = CohortIndex(str(tmp_path / 'incremental.sqlite'))
+    for month in MONTHS:
+        incremental.apply_month(month, periods[month], activity[month])
+    # Back-filled and re-applied months rebuild the customer table
+    rebuilt = CohortIndex(str(tmp_path / 'rebuilt.sqlite'))
+    for month in ('MAR_2024', 'JAN_2024', 'FEB_2024', 'JAN_2024'):
+        rebuilt.apply_month(month, periods[month], activity[month])
+
+    assert incremental.months() == rebuilt.months() == MONTHS
+    expected = orders.groupby('customer')['date'].min().sort_index()
+    for index in (incremental, rebuilt):
+        first = index.first_orders().sort_index()
+        assert first.to_dict() == expected.to_dict()
+    pd.testing.assert_frame_equal(incremental.customer_split(MONTHS), rebuilt.customer_split(MONTHS))
+    pd.testing.assert_frame_equal(incremental.purchasing_gap(MONTHS), rebuilt.purchasing_gap(MONTHS))
+    split = incremental.customer_split(MONTHS).set_index('Month')
+    assert split['New Orders'].tolist() == [3, 1, 1]
+    assert split['Total Orders'].tolist() == [4, 3, 3]
@@ -0,0 +1,77 @@
+import glob
+import os
+
+import pandas as pd
+import pytest
+
+from data_loader import read_items_file
+from synthetic_data import write_dataset
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def legacy_items(filepath):
+    """The pandas reader read_items_file replaced, followed by the per-product
+    totals the views computed from its rows."""
+    items_df = pd.read_excel(filepath, header=None, nrows=10)
+    header_row = 0
+    for index, row in items_df.iterrows():
+        if row.astype(str).str.lower().str.contains('row labels|product|item').any():
+            header_row = index
+            break
+    items_df = pd.read_excel(filepath, header=header_row)
+    new_columns = {}
+    for col in items_df.columns:
+        col_lower = str(col).lower()
+        if 'row labels' in col_lower or 'product' in col_lower or 'item' in col_lower:
+            new_columns[col] = 'Product'
+        elif 'quantity' in col_lower or 'qty' in col_lower:
+            new_columns[col] = 'Quantity'
+    items_df = items_df.rename(columns=new_columns)
+    if 'Product' not in items_df.columns or 'Quantity' not in items_df.columns:
+        return None
+    items_df = items_df[items_df['Product'].notna()]
+    items_df = items_df[~items_df['Product'].astype(str).str.lower().str.contains('grand total', na=False)]
+    totals = items_df.groupby('Product', as_index=False)['Quantity'].sum()
+    return totals.sort_values('Product', key=lambda col: col.astype(str)).reset_index(drop=True)
+
+
+def _assert_matches_legacy(path):
+    expected = legacy_items(path)
+    actual = read_items_file(path)
+    assert expected is not None
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('path', sorted(glob.glob(os.path.join(REPO, '*', 'ITEMS.xlsx'))))
+def test_bundled_items_match_the_legacy_reader(path):
+    _assert_matches_legacy(path)
+
+
+@pytest.mark.parametrize('header_rows', [0, 1, 4])
+def test_synthetic_items_match_the_legacy_reader(tmp_path, header_rows):
+    write_dataset(str(tmp_path), months=1, products=50, header_rows=header_rows)
+    _assert_matches_legacy(str(tmp_path / 'JAN_2024' / 'ITEMS.xlsx'))
+
+
+def test_blank_rows_and_a_qty_column(tmp_path):
+    path = str(tmp_path / 'ITEMS.xlsx')
+    pd.DataFrame([
+        ['Monthly report', None, None],
+        [None, None, None],
+        ['Item name', 'Store', 'Qty'],
+        ['Rice', 'A', 2],
+        [None, 'A', 5],
+        ['Dal', 'A', None],
+        ['Rice', 'B', '3'],
+        ['grand total', None, 10],
+    ]).to_excel(path, header=False, index=False)
+    result = read_items_file(path)
+    assert result.to_dict('list') == {'Product': ['Dal', 'Rice'], 'Quantity': [0, 5.0]}
+
+
+def test_sheet_without_a_quantity_column(tmp_path):
+    path = str(tmp_path / 'ITEMS.xlsx')
+    pd.DataFrame({'Product': ['Rice'], 'Store': ['A']}).to_excel(path, index=False)
+    assert read_items_file(path) is None
+    assert legacy_items(path) is None
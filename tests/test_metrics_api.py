@@ -0,0 +1,35 @@
+import threading
+
+import pytest
+
+from metrics_api import ApiError, Metrics
+from synthetic_data import write_dataset
+
+
+def _start(metrics):
+    threading.Thread(target=metrics.run_sync, daemon=True).start()
+
+
+def test_failed_first_sync_is_reported(tmp_path):
+    # A file where the state folder should be makes every sync fail
+    (tmp_path / '.dashboard').write_text('')
+    metrics = Metrics(str(tmp_path))
+    _start(metrics)
+    with pytest.raises(OSError):
+        metrics.wait_ready(timeout=30)
+    with pytest.raises(ApiError, match='failed') as info:
+        metrics.response('/api/months', {})
+    assert info.value.status == 503
+
+
+def test_responses_come_from_the_synced_snapshot(tmp_path):
+    write_dataset(str(tmp_path), months=2, products=5)
+    metrics = Metrics(str(tmp_path))
+    _start(metrics)
+    metrics.wait_ready(timeout=60)
+    first = metrics.response('/api/kpis', {'months': 'FEB_2024'})
+    assert b'"total orders"' in first.body
+    assert metrics.response('/api/kpis', {'months': 'FEB_2024'}) is first
+    with pytest.raises(ApiError) as info:
+        metrics.response('/api/kpis', {'months': 'MAR_2024'})
+    assert info.value.status == 404
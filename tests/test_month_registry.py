@@ -0,0 +1,23 @@
+import os
+
+from month_registry import MonthRegistry
+from synthetic_data import write_dataset
+
+
+def test_manifest_checks_the_folders_once(tmp_path):
+    write_dataset(str(tmp_path), months=3, products=5)
+    registry = MonthRegistry(str(tmp_path))
+    checks = []
+    current_stamps = registry._current_stamps
+    registry._current_stamps = lambda: checks.append(1) or current_stamps()
+
+    manifest = registry.manifest()
+    assert list(manifest) == registry.months()
+    assert all(manifest[month] == registry.files(month) for month in manifest)
+    # One check per manifest() and months(); files() reads the last scan
+    assert len(checks) == 2
+    assert registry.scans == 1
+
+    os.rename(tmp_path / 'MAR_2024', tmp_path / 'APR_2024')
+    assert list(registry.manifest()) == ['JAN_2024', 'FEB_2024', 'APR_2024']
+    assert registry.scans == 2
@@ -0,0 +1,38 @@
+import pandas as pd
+
+from data_loader import parse_payment_grid
+
+
+def _grid(rows):
+    return pd.DataFrame(rows, dtype=object)
+
+
+def test_methods_below_day_numbers_are_detected():
+    raw = _grid([
+        [1, 2, None],
+        ['COD: 3', 'COD: 1', None],
+        ['UPI: 2', 'Instamojo: 4', None],
+    ])
+    parsed = parse_payment_grid(raw)
+    assert list(parsed.columns) == ['Day', 'COD', 'Instamojo', 'UPI']
+    assert parsed.to_dict('records') == [
+        {'Day': 1, 'COD': 3, 'Instamojo': 0, 'UPI': 2},
+        {'Day': 2, 'COD': 1, 'Instamojo': 4, 'UPI': 0},
+    ]
+
+
+def test_labels_outside_the_day_cells_are_not_methods():
+    raw = _grid([
+        ['Notes: 3', None, None],
+        [1, 2, 'Total: 12'],
+        ['COD: 3', 'COD: 1', None],
+        ['Instamojo: 5', 'Instamojo: 3', 'Total: 12'],
+        [None, None, None],
+        [None, None, None],
+        [None, None, None],
+        ['Summary: 8', None, None],
+    ])
+    parsed = parse_payment_grid(raw)
+    assert list(parsed.columns) == ['Day', 'COD', 'Instamojo']
+    assert parsed['COD'].tolist() == [3, 1]
+    assert parsed['Instamojo'].tolist() == [5, 3]
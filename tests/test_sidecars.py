@@ -0,0 +1,41 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+import data_loader
+from synthetic_data import write_dataset
+
+
+def _orders_path(base_path):
+    return os.path.join(base_path, 'JAN_2024', 'jan_2024_orders.xlsx')
+
+
+def test_sidecar_is_used_for_an_unchanged_source(tmp_path):
+    write_dataset(str(tmp_path), months=1, products=5)
+    path = _orders_path(tmp_path)
+    first = data_loader.read_file(path, 'orders')
+    assert data_loader.sidecar_is_fresh(path, 'orders')
+    pd.testing.assert_frame_equal(data_loader.read_file(path, 'orders'), first)
+
+
+def test_restored_older_source_is_reparsed(tmp_path):
+    write_dataset(str(tmp_path), months=1, products=5)
+    path = _orders_path(tmp_path)
+    backup = os.path.join(tmp_path, 'orders_backup.xlsx')
+    shutil.copy2(path, backup)
+    original = data_loader.read_file(path, 'orders')
+
+    edited = pd.read_excel(path)
+    edited['Total Orders'] = 99999
+    edited.to_excel(path, index=False)
+    assert (data_loader.read_file(path, 'orders')['Total Orders'] == 99999).all()
+
+    # The restored file is older than the sidecar written from the edit
+    shutil.copy2(backup, path)
+    assert os.path.getmtime(path) < os.path.getmtime(data_loader.sidecar_path(path, 'orders'))
+    assert not data_loader.sidecar_is_fresh(path, 'orders')
+    pd.testing.assert_frame_equal(data_loader.read_file(path, 'orders'), original)
@@ -0,0 +1,21 @@
+import os
+import re
+from urllib.parse import unquote
+
+from snapshot import export
+from synthetic_data import write_dataset
+
+
+def test_nav_links_resolve_for_partition_names(tmp_path):
+    data = tmp_path / 'data'
+    write_dataset(str(data), months=2, products=5)
+    os.makedirs(data / '2024')
+    for month in ('JAN', 'FEB'):
+        os.rename(data / f'{month}_2024', data / '2024' / month)
+    out = tmp_path / 'site'
+
+    result = export(str(data), str(out), shared_js=True)
+    assert result == {'ALL': 'written', 'JAN 2024': 'written', 'FEB 2024': 'written'}
+    hrefs = re.findall(r'<a href="([^"]+)"', (out / 'index.html').read_text())
+    assert hrefs == ['index.html', 'JAN%202024.html', 'FEB%202024.html']
+    assert all(os.path.exists(out / unquote(href)) for href in hrefs)
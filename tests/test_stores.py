@@ -0,0 +1,37 @@
+import glob
+import os
+
+import pandas as pd
+
+from cohort_index import index_path
+from network import get_network
+from synthetic_data import write_dataset
+
+
+def _kpi(path, kpi):
+    df = pd.read_excel(path)
+    return float(df.loc[df['KPI'] == kpi, 'Value'].iloc[0])
+
+
+def test_stores_keep_their_own_aggregates_with_a_db_override(tmp_path, monkeypatch):
+    monkeypatch.setenv('DASHBOARD_AGGREGATES_DB', str(tmp_path / 'state' / 'aggregates.sqlite'))
+    base = tmp_path / 'data'
+    write_dataset(str(base), months=2, products=5, stores=3)
+    expected = {store: _kpi(glob.glob(str(base / 'stores' / store / '2024' / 'FEB' / '*_kpi_cards.xlsx'))[0],
+                            'Total Orders')
+                for store in ('STORE_01', 'STORE_02', 'STORE_03')}
+    assert len(set(expected.values())) == 3
+
+    network, months, _, errors = get_network(str(base))
+    assert not errors
+    assert months == ['JAN 2024', 'FEB 2024']
+    feb = network.kpi_by_store('Total Orders', ['FEB 2024']).set_index('Store')['Value'].to_dict()
+    assert feb == expected
+    assert len({store.db_path for store in network.stores.values()}) == 3
+    assert all(os.path.dirname(store.db_path) == str(tmp_path / 'state') for store in network.stores.values())
+
+
+def test_cohort_db_override_is_per_store(tmp_path, monkeypatch):
+    monkeypatch.setenv('DASHBOARD_COHORT_DB', str(tmp_path / 'customers.sqlite'))
+    assert index_path(str(tmp_path)) == str(tmp_path / 'customers.sqlite')
+    assert index_path(str(tmp_path / 'stores' / 'KOCHI')) == str(tmp_path / 'customers.KOCHI.sqlite')
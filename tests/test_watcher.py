@@ -0,0 +1,114 @@
+import os
+
+import pandas as pd
+import pytest
+
+import data_loader
+from aggregate_store import get_store
+from cohort_index import get_index
+from figure_cache import cached_figure, figures, source_version
+from month_registry import get_registry
+from synthetic_data import write_dataset
+from views import all_charts, month_charts
+import watcher as watcher_module
+from watcher import FileWatcher
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    write_dataset(str(tmp_path), months=2, products=5)
+    figures.clear()
+    data_loader.clear_all()
+    yield str(tmp_path)
+    figures.clear()
+    data_loader.clear_all()
+
+
+def _warm(base_path):
+    """Load every month page and the ALL page into the caches, as visits would."""
+    registry = get_registry(base_path)
+    all_files = registry.manifest()
+    store = get_store(base_path)
+    store.sync(all_files)
+    pages = [(month, month_charts(files)) for month, files in all_files.items()]
+    pages.append(('ALL', all_charts(store, list(all_files), all_files, get_index(base_path))))
+    for page, charts in pages:
+        for chart in charts:
+            cached_figure(registry.page(page), chart.chart_id, chart.sources, chart.build, *chart.extra)
+    return all_files
+
+
+def _cached_charts():
+    return set(figures._entries)
+
+
+def _touch_orders(path):
+    df = pd.read_excel(path)
+    df['Total Orders'] = df['Total Orders'] + 1
+    df.to_excel(path, index=False)
+
+
+def test_change_drops_only_what_was_built_from_the_file(dataset):
+    all_files = _warm(dataset)
+    watcher = FileWatcher(dataset, rewarm=False)
+    assert watcher.poll() == []
+    before = _cached_charts()
+    assert ('JAN_2024', 'daily_orders') in before
+
+    orders = all_files['JAN_2024']['orders']
+    _touch_orders(orders)
+    changes = watcher.poll()
+    assert [(c.month, c.kind, c.status) for c in changes] == [('JAN_2024', 'orders', 'modified')]
+    assert before - _cached_charts() == {('JAN_2024', 'daily_orders')}
+    assert not data_loader._cache.lookup(orders, 'orders')[0]
+    assert data_loader._cache.lookup(all_files['JAN_2024']['kpi'], 'kpi')[0]
+    assert watcher.poll() == []
+
+
+def test_kpi_change_invalidates_the_aggregates_and_rewarms(dataset):
+    all_files = _warm(dataset)
+    watcher = FileWatcher(dataset, rewarm=True)
+    watcher.poll()
+    kpi = all_files['FEB_2024']['kpi']
+    df = pd.read_excel(kpi)
+    df.loc[df['KPI'] == 'Total Orders', 'Value'] = 54321
+    df.to_excel(kpi, index=False)
+
+    assert [c.kind for c in watcher.poll()] == ['kpi']
+    assert not watcher.errors
+    store = get_store(dataset)
+    assert store.kpi_by_month('Total Orders', ['FEB_2024'])['Value'].iloc[0] == 54321
+    # Rebuilt in the watcher, stamped with the new file versions
+    chart = {chart.chart_id: chart for chart in all_charts(store, list(all_files), all_files,
+                                                           get_index(dataset))}['orders']
+    assert figures._entries[('ALL', 'orders')]['version'] == source_version(chart.sources, *chart.extra)
+    assert data_loader._cache.lookup(kpi, 'kpi')[0]
+
+def test_new_month_clears_the_all_page(dataset):
+    _warm(dataset)
+    watcher = FileWatcher(dataset, rewarm=False)
+    watcher.poll()
+    write_dataset(os.path.join(dataset, 'more'), months=3, products=5)
+    os.rename(os.path.join(dataset, 'more', 'MAR_2024'), os.path.join(dataset, 'MAR_2024'))
+
+    changes = watcher.poll()
+    assert {c.month for c in changes} == {'MAR_2024'}
+    assert all(c.status == 'added' for c in changes)
+    assert not any(page == 'ALL' for page, _ in _cached_charts())
+    assert ('JAN_2024', 'daily_orders') in _cached_charts()
+
+
+def test_idle_watcher_stops_and_is_replaced(dataset, monkeypatch):
+    watcher = FileWatcher(dataset, interval=0.01, idle_timeout=0.05).start()
+    watcher._thread.join(timeout=5)
+    assert not watcher._thread.is_alive()
+    assert not watcher.touch()
+
+    monkeypatch.setattr(watcher_module, 'WATCH_INTERVAL', 2)
+    monkeypatch.setattr(watcher_module, '_watchers', {os.path.abspath(dataset): watcher})
+    replacement = watcher_module.start_watcher(dataset)
+    try:
+        assert replacement is not watcher and replacement._thread.is_alive()
+        assert watcher_module.start_watcher(dataset) is replacement
+    finally:
+        replacement.stop()
@@ -0,0 +1,174 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import pandas as pd
+
+import perf
+from data_loader import cached, file_stamp, load_abv, load_orders, load_turnover
+
+# Daily metric files and the value column each one holds.
+DAILY_METRICS = {
+    'abv': 'Average Basket Value',
+    'orders': 'Total Orders',
+    'turnover': 'Daily Turnover',
+}
+
+_DAILY_LOADERS = {
+    'abv': load_abv,
+    'orders': load_orders,
+    'turnover': load_turnover,
+}
+
+# Months whose combined daily frame is kept by month_daily_frame
+MAX_MONTH_FRAMES = 64
+_month_frames = OrderedDict()
+_month_frames_lock = threading.Lock()
+
+# Candidate formats for text dates, tried in order; on a tie the earlier one
+# wins. There are deliberately no month-first formats: the exports write
+# dates day first, so 03-01-2024 is always 3 January.
+DATE_FORMATS = (
+    '%d-%m-%Y', '%d/%m/%Y', '%d.%m.%Y', '%Y-%m-%d', '%Y/%m/%d',
+    '%d-%m-%y', '%d/%m/%y', '%d-%b-%Y', '%d %b %Y', '%d-%B-%Y', '%d %B %Y',
+)
+
+
+def detect_date_format(values, sample_size=50):
+    """Return the DATE_FORMATS entry that parses most of a sample of the text
+    values, or None if none of them parses any."""
+    sample = [value.strip() for value in values if isinstance(value, str)][:sample_size]
+    best, best_count = None, 0
+    for fmt in DATE_FORMATS:
+        count = 0
+        for value in sample:
+            try:
+                datetime.strptime(value, fmt)
+                count += 1
+            except ValueError:
+                pass
+        if count > best_count:
+            best, best_count = fmt, count
+            if count == len(sample):
+                break
+    return best
+
+
+def parse_dates(values):
+    """Parse a date column in one vectorized pass with a detected format.
+    Cells Excel already stored as dates are kept; unparseable cells become
+    NaT. Falls back to day-first inference when no format matches."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    fmt = detect_date_format(values)
+    if fmt is None:
+        return pd.to_datetime(values, dayfirst=True, errors='coerce')
+    if values.dtype == object or pd.api.types.is_string_dtype(values):
+        # .str yields NaN for the non-text cells of mixed columns
+        stripped = values.str.strip()
+        values = values.where(stripped.isna(), stripped)
+    return pd.to_datetime(values, format=fmt, errors='coerce')
+
+
+def daily_series(df, column):
+    """Clean one daily metric sheet into a Series indexed by Date.
+    Rows with a missing or unparseable date are dropped, only the most
+    frequent year is kept and the first row wins for duplicate dates.
+    Returns None if the sheet lacks a Date or value column."""
+    if 'Date' not in df.columns or column not in df.columns:
+        return None
+    df = df.dropna(subset=['Date', column])
+    dates = parse_dates(df['Date'])
+    values = df[column][dates.notna()]
+    dates = dates[dates.notna()]
+    if not dates.empty:
+        in_year = dates.dt.year == dates.dt.year.mode()[0]
+        dates, values = dates[in_year], values[in_year]
+    series = pd.Series(values.to_numpy(), index=pd.DatetimeIndex(dates, name='Date'), name=column)
+    series = series.sort_index(kind='stable')
+    return series[~series.index.duplicated(keep='first')]
+
+
+def load_daily_series(filepath, kind):
+    """Cached daily_series for one metric file."""
+    column = DAILY_METRICS[kind]
+    return cached(filepath, f'{kind}:daily', lambda path: daily_series(_DAILY_LOADERS[kind](path), column))
+
+
+def month_bounds(date):
+    """First and last day of date's month."""
+    start = pd.Timestamp(date).normalize().replace(day=1)
+    return start, start + pd.offsets.MonthEnd(0)
+
+
+def daily_frame(month_files, kinds=tuple(DAILY_METRICS)):
+    """Load a month's daily metrics into one frame on a complete calendar.
+    Returns (frame, errors): frame has a DatetimeIndex spanning every day of
+    the months covered, one column per available metric (NaN on days a
+    file has no row for), and errors maps kind to the exception raised
+    while loading it."""
+    with perf.timer('transform', 'daily_frame', kinds=','.join(kinds)) as event:
+        frame, errors = _daily_frame(month_files, kinds)
+        event['rows'] = len(frame)
+    return frame, errors
+
+
+def _daily_frame(month_files, kinds):
+    series, errors = [], {}
+    for kind in kinds:
+        path = month_files.get(kind)
+        if path is None:
+            continue
+        try:
+            metric = load_daily_series(path, kind)
+        except Exception as e:
+            errors[kind] = e
+            continue
+        if metric is not None and not metric.empty:
+            series.append(metric)
+    if not series:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name='Date')), errors
+    frame = pd.concat(series, axis=1)
+    start, _ = month_bounds(frame.index.min())
+    _, end = month_bounds(frame.index.max())
+    return frame.reindex(pd.date_range(start, end, freq='D', name='Date')), errors
+
+
+def _sources_stamp(paths):
+    stamps = []
+    for path in paths:
+        try:
+            stamps.append(None if path is None else file_stamp(path))
+        except OSError:
+            stamps.append('missing')
+    return tuple(stamps)
+
+
+def month_daily_frame(month_files):
+    """daily_frame of every daily metric of a month, built once and kept
+    until one of its three source files changes, so the charts of a page
+    slice one shared frame instead of each loading its own. The returned
+    frame is shared and must not be modified."""
+    paths = tuple(month_files.get(kind) for kind in DAILY_METRICS)
+    key = tuple(None if path is None else os.path.abspath(path) for path in paths)
+    stamp = _sources_stamp(paths)
+    with _month_frames_lock:
+        entry = _month_frames.get(key)
+        if entry is not None and entry[0] == stamp:
+            _month_frames.move_to_end(key)
+            return entry[1]
+    result = daily_frame(month_files)
+    with _month_frames_lock:
+        _month_frames[key] = (stamp, result)
+        _month_frames.move_to_end(key)
+        while len(_month_frames) > MAX_MONTH_FRAMES:
+            _month_frames.popitem(last=False)
+    return result
+
+
+def slice_daily(frame, start=None, end=None, metrics=None):
+    """Rows of a daily frame between start and end (inclusive), optionally
+    restricted to some metric columns."""
+    frame = frame.loc[start:end]
+    return frame[list(metrics)] if metrics is not None else frame
@@ -0,0 +1,264 @@
+from collections import namedtuple
+
+import pandas as pd
+
+from charts import (monthly_orders_figure, top_products, top_products_figure, purchasing_gap_figure,
+                    payment_totals_figure, payment_trend_figure, customer_pie_figure, daily_figure,
+                    store_orders_figure)
+from daily_store import daily_sources
+from data_loader import load_kpi, load_items, load_purchasing_gap, load_payment
+from timeseries import DAILY_METRICS, month_daily_frame, slice_daily
+
+# The dashboard's pages without Streamlit: which charts a page shows, in
+# order, how each is built and which files it is built from. app.py and
+# snapshot.py both render from these.
+
+# chart_id is the figure cache key within a page; extra holds values other
+# than the source files that change the chart (e.g. the month list).
+Chart = namedtuple('Chart', ['chart_id', 'title', 'sources', 'build', 'extra'])
+
+# (kind, message name, y-axis title, colour, y tick format, title) per daily chart
+DAILY_CHARTS = (
+    ('abv', 'ABV', 'ABV (₹)', None, None, 'Average Basket Value Trend'),
+    ('orders', 'Orders', 'Orders', 'green', None, 'Day-wise Orders Trend'),
+    ('turnover', 'Turnover', 'Turnover (₹)', 'orange', '.2s', 'Daily Turnover Trend'),
+)
+
+
+def kpi_values(kpi_file):
+    """KPI sheet with stripped names and numeric values."""
+    kpi_df = load_kpi(kpi_file)
+    kpi_df['KPI'] = kpi_df['KPI'].astype(str).str.strip()
+    kpi_df['Value'] = pd.to_numeric(kpi_df['Value'], errors='coerce')
+    return kpi_df
+
+
+def format_kpi(name, value):
+    lower = name.lower()
+    if 'turnover' in lower or 'basket' in lower:
+        return f'₹{value:,.2f}'
+    if 'rate' in lower or 'retention' in lower:
+        return f'{value:.2f}%'
+    return f'{value:,.0f}'
+
+
+def kpi_cards(month, kpi_file, cohort):
+    """(name, formatted value) for each KPI card of a month, adding the
+    retention rate when the sheet has none."""
+    kpi_df = kpi_values(kpi_file)
+
+    # Calculate or Set Retention Rate
+    if not kpi_df['KPI'].str.contains('Retention', case=False).any():
+        retention_value = None
+        split = cohort.customer_split([month])
+
+        # Prefer the cohort index (months built by ingest.py), then
+        # hardcoded values for the hand-made sheets
+        if not split.empty:
+            retention_value = split['Retention Rate'].iloc[0]
+        elif month == 'DEC':
+            retention_value = 12.2
+        elif month == 'JAN':
+            retention_value = 16.0
+        else:
+            # Calculate for other months (like NOV)
+            try:
+                total_orders = kpi_df.loc[kpi_df['KPI'].str.contains('Total Orders', case=False), 'Value'].values[0]
+                old_orders = kpi_df.loc[kpi_df['KPI'].str.contains('Old Orders', case=False), 'Value'].values[0]
+                if total_orders > 0:
+                    retention_value = (old_orders / total_orders) * 100
+            except:
+                pass
+
+        if retention_value is not None:
+            new_row = pd.DataFrame({'KPI': ['Retention Rate'], 'Value': [retention_value]})
+            kpi_df = pd.concat([kpi_df, new_row], ignore_index=True)
+
+    kpi_df = kpi_df.dropna(subset=['Value'])
+    return [(name, format_kpi(name, value)) for name, value in zip(kpi_df['KPI'], kpi_df['Value'])]
+
+
+def customers_chart(kpi_file):
+    def build():
+        kpi_lower = kpi_values(kpi_file).dropna(subset=['Value'])
+        kpi_lower['KPI'] = kpi_lower['KPI'].str.lower()
+        new_orders = 0
+        old_orders = 0
+        try:
+            new_orders = kpi_lower.loc[kpi_lower['KPI'] == 'new orders', 'Value'].values[0]
+        except:
+            pass
+        try:
+            old_orders = kpi_lower.loc[kpi_lower['KPI'] == 'old orders', 'Value'].values[0]
+        except:
+            pass
+        if new_orders > 0 or old_orders > 0:
+            return customer_pie_figure(new_orders, old_orders)
+        return None
+    return Chart('customers', 'Old vs New Customers', [kpi_file], build, ())
+
+
+def top_products_chart(items_file):
+    def build():
+        items_df = load_items(items_file)
+        if items_df is None:
+            return None
+        return top_products_figure(top_products(items_df, 10))
+    return Chart('top_products', 'Top 10 Products', [items_file], build, ())
+
+
+def daily_chart(month_files, kind, yaxis_title, color=None, y_tickformat=None, title=None):
+    """One daily metric chart of a month, sliced from the month's shared
+    daily frame."""
+    column = DAILY_METRICS[kind]
+
+    def build():
+        daily, errors = month_daily_frame(month_files)
+        if kind in errors:
+            raise errors[kind]
+        if column not in daily:
+            return None
+        return daily_figure(slice_daily(daily, metrics=[column]), column, yaxis_title, color=color, y_tickformat=y_tickformat)
+    return Chart(f'daily_{kind}', title or column, [month_files.get(kind)], build, ())
+
+
+def purchasing_gap_chart(gap_file):
+    def build():
+        gap_df = load_purchasing_gap(gap_file)
+        if 'Purchasing Gap' in gap_df.columns and 'Percentage' in gap_df.columns:
+            return purchasing_gap_figure(gap_df)
+        return None
+    return Chart('purchasing_gap', 'Customer Purchasing Gap (%)', [gap_file], build, ())
+
+
+def payment_trend_chart(payment_file):
+    def build():
+        pay_df = load_payment(payment_file)
+        return payment_trend_figure(pay_df) if not pay_df.empty else None
+    return Chart('payment_trend', 'Payment Method Trend (COD vs Instamojo)', [payment_file], build, ())
+
+
+def month_charts(month_files):
+    """Charts of a month page in page order, skipping those whose file is
+    missing (the daily charts are always listed)."""
+    charts = []
+    if month_files.get('kpi'):
+        charts.append(customers_chart(month_files['kpi']))
+    if month_files.get('items'):
+        charts.append(top_products_chart(month_files['items']))
+    for kind, _, yaxis_title, color, y_tickformat, title in DAILY_CHARTS:
+        charts.append(daily_chart(month_files, kind, yaxis_title, color, y_tickformat, title))
+    if month_files.get('purchasing_gap'):
+        charts.append(purchasing_gap_chart(month_files['purchasing_gap']))
+    if month_files.get('payment_method'):
+        charts.append(payment_trend_chart(month_files['payment_method']))
+    return charts
+
+
+def all_charts(store, months, all_files, cohort):
+    """Charts of the ALL page, from a synced aggregate store and the cohort
+    index."""
+    months = list(months)
+    extra = (months,)
+
+    def sources(kind):
+        return [all_files[m].get(kind) for m in months]
+
+    def orders():
+        orders_df = store.kpi_by_month('Total Orders', months).rename(columns={'Value': 'Total Orders'})
+        return monthly_orders_figure(orders_df) if not orders_df.empty else None
+
+    def products():
+        top_10_all = store.top_products(months, 10)
+        return top_products_figure(top_10_all, '#9B59B6', 'Total Quantity') if not top_10_all.empty else None
+
+    def gap():
+        # Weighted by customers when every month is in the cohort index,
+        # otherwise the mean of the monthly sheets
+        if cohort.covers(months):
+            gap_grouped = cohort.purchasing_gap(months)
+        else:
+            gap_grouped = store.purchasing_gap(months)
+        return purchasing_gap_figure(gap_grouped) if not gap_grouped.empty else None
+
+    def payments():
+        pay_sum_df = store.payment_totals(months)
+        return payment_totals_figure(pay_sum_df) if not pay_sum_df.empty else None
+
+    return [
+        Chart('orders', 'Monthly Total Orders Comparison', sources('kpi'), orders, extra),
+        Chart('top_products', f"Top 10 Best-Selling Products ({' + '.join(months)} Combined)",
+              sources('items'), products, extra),
+        Chart('purchasing_gap', 'Customer Purchasing Gap (%)',
+              sources('purchasing_gap') + [cohort.db_path], gap, extra),
+        Chart('payment_totals', 'COD vs Instamojo by Month', sources('payment_method'), payments, extra),
+    ]
+
+
+def network_charts(network, months, store_files):
+    """Charts of the network-wide view, from a synced network.NetworkStore
+    and its {store: {month: {kind: path}}}."""
+    months = list(months)
+    extra = (list(store_files), months)
+
+    def sources(kind):
+        return [files[m].get(kind) for files in store_files.values() for m in months if m in files]
+
+    def orders():
+        orders_df = network.kpi_by_month('Total Orders', months).rename(columns={'Value': 'Total Orders'})
+        return monthly_orders_figure(orders_df) if not orders_df.empty else None
+
+    def store_orders():
+        by_store = network.kpi_by_store('Total Orders', months)
+        if by_store.empty:
+            return None
+        totals = by_store.groupby('Store', as_index=False)['Value'].sum()
+        return store_orders_figure(totals.rename(columns={'Value': 'Total Orders'}))
+
+    def products():
+        top_10_all = network.top_products(months, 10)
+        return top_products_figure(top_10_all, '#9B59B6', 'Total Quantity') if not top_10_all.empty else None
+
+    def gap():
+        gap_grouped = network.purchasing_gap(months)
+        return purchasing_gap_figure(gap_grouped) if not gap_grouped.empty else None
+
+    def payments():
+        pay_sum_df = network.payment_totals(months)
+        return payment_totals_figure(pay_sum_df) if not pay_sum_df.empty else None
+
+    return [
+        Chart('orders', 'Monthly Total Orders, All Stores', sources('kpi'), orders, extra),
+        Chart('store_orders', 'Total Orders by Store', sources('kpi'), store_orders, extra),
+        Chart('top_products', 'Top 10 Best-Selling Products (All Stores)', sources('items'), products, extra),
+        Chart('purchasing_gap', 'Customer Purchasing Gap (%)', sources('purchasing_gap'), gap, extra),
+        Chart('payment_totals', 'COD vs Instamojo by Month', sources('payment_method'), payments, extra),
+    ]
+
+
+def range_cards(totals):
+    """(name, formatted value) KPI cards of DailyStore.totals()."""
+    cards = []
+    for name in ('Total Orders', 'Turnover', 'Average Basket Value', 'Orders per Day', 'Days'):
+        value = totals[name]
+        if pd.notna(value):
+            cards.append((name, f'{value:,.1f}' if name == 'Orders per Day' else format_kpi(name, value)))
+    return cards
+
+
+def range_charts(store, month_files, start, end):
+    """Daily charts of a DailyStore between start and end. The charts are
+    keyed by chart id alone, so a new range replaces the cached figures."""
+    sources = daily_sources(month_files)
+    charts = []
+    for kind, _, yaxis_title, color, y_tickformat, title in DAILY_CHARTS:
+        column = DAILY_METRICS[kind]
+
+        def build(column=column, yaxis_title=yaxis_title, color=color, y_tickformat=y_tickformat):
+            daily = store.slice(start, end)
+            if daily[column].isna().all():
+                return None
+            return daily_figure(daily, column, yaxis_title, color=color, y_tickformat=y_tickformat,
+                                x_range=(start, end))
+        charts.append(Chart(f'daily_{kind}', title, sources, build, (str(start), str(end))))
+    return charts
@@ -0,0 +1,185 @@
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+from aggregate_store import AGGREGATE_KINDS, get_store
+from cohort_index import get_index, index_path
+from data_loader import LOADERS, clear_file
+from figure_cache import figures, source_version
+from month_registry import get_registry
+from views import all_charts, month_charts
+
+# Seconds between polls of the month folders; 0 turns the watcher off.
+WATCH_INTERVAL = float(os.environ.get('DASHBOARD_WATCH_INTERVAL', '2'))
+# Rebuild what a change invalidated right away rather than on the next visit.
+WATCH_REWARM = os.environ.get('DASHBOARD_WATCH_REWARM', '1') != '0'
+# Seconds a watcher keeps polling after its store was last viewed; 0 keeps
+# it running for the life of the process.
+WATCH_IDLE = float(os.environ.get('DASHBOARD_WATCH_IDLE', '600'))
+
+# status is 'added', 'modified' or 'removed'; month is None for the cohort index.
+Change = namedtuple('Change', ['month', 'kind', 'path', 'status'])
+
+
+def _stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class FileWatcher:
+    """Polls the month files under base_path, and the cohort index, for
+    changes. A changed file is dropped from the data cache, its month and
+    kind from the aggregate store and the charts built from it from the
+    figure cache; everything else stays cached. With rewarm, the file, the
+    aggregates and those charts are rebuilt in the watcher's thread, so the
+    next visitor finds them ready. A poll costs a stat per folder and file;
+    nothing is opened unless it changed. The thread ends once idle_timeout
+    seconds pass without a touch(), so stores nobody views stop being
+    polled."""
+
+    def __init__(self, base_path, interval=WATCH_INTERVAL, rewarm=WATCH_REWARM, idle_timeout=WATCH_IDLE):
+        self.base_path = os.path.abspath(base_path)
+        self.interval = interval
+        self.rewarm = rewarm
+        self.idle_timeout = idle_timeout
+        self.registry = get_registry(self.base_path)
+        self._stamps = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._state_lock = threading.Lock()
+        self._last_used = time.monotonic()
+        self._stopped = False
+        self.polls = 0
+        self.changes = 0
+        self.errors = deque(maxlen=20)
+
+    def _current(self):
+        """{path: (month, kind, stamp)} for every month file and the cohort index."""
+        files = {}
+        for month, month_files in self.registry.manifest().items():
+            for kind, path in month_files.items():
+                files[path] = (month, kind, _stamp(path))
+        cohort = index_path(self.base_path)
+        files[cohort] = (None, 'cohort', _stamp(cohort))
+        return files
+
+    def poll(self):
+        """Check for changes once and handle them. The first poll only
+        records the current stamps. Returns the Changes found."""
+        current = self._current()
+        previous, self._stamps = self._stamps, current
+        self.polls += 1
+        if previous is None:
+            return []
+        changes = [Change(month, kind, path, 'added' if path not in previous else 'modified')
+                   for path, (month, kind, stamp) in current.items()
+                   if path not in previous or previous[path][2] != stamp]
+        changes += [Change(month, kind, path, 'removed')
+                    for path, (month, kind, _) in previous.items() if path not in current]
+        if changes:
+            self.changes += len(changes)
+            self.handle(changes)
+        return changes
+
+    def _guard(self, what, func, *args):
+        try:
+            return func(*args)
+        except Exception as e:
+            self.errors.append(f'{what}: {e}')
+
+    def affected_charts(self, changes, all_files):
+        """(figure cache page, views.Chart) for every chart built from a
+        changed file."""
+        paths = {os.path.abspath(change.path) for change in changes}
+        months = list(all_files)
+        pages = [(self.registry.page(month), month_charts(all_files[month]))
+                 for month in dict.fromkeys(change.month for change in changes) if month in all_files]
+        pages.append((self.registry.page('ALL'), all_charts(get_store(self.base_path), months, all_files, get_index(self.base_path))))
+        return [(page, chart) for page, charts in pages for chart in charts
+                if any(source and os.path.abspath(source) in paths for source in chart.sources)]
+
+    def handle(self, changes):
+        store = get_store(self.base_path)
+        all_files = self.registry.manifest()
+        for change in changes:
+            clear_file(change.path)
+            if change.kind in AGGREGATE_KINDS:
+                store.invalidate(change.month, change.kind)
+            if change.status != 'modified':
+                # The month's chart list or the ALL view's months changed;
+                # their figure versions no longer match, so free them now.
+                if change.month is not None:
+                    figures.clear_month(self.registry.page(change.month))
+                figures.clear_month(self.registry.page('ALL'))
+        affected = self.affected_charts(changes, all_files)
+        for page, chart in affected:
+            figures.discard(page, chart.chart_id)
+        if not self.rewarm:
+            return
+        for change in changes:
+            if change.status != 'removed' and change.kind in LOADERS:
+                self._guard(change.path, LOADERS[change.kind], change.path)
+        if any(change.kind in AGGREGATE_KINDS for change in changes):
+            for err in self._guard('aggregates', store.sync, all_files) or []:
+                self.errors.append(f'{err.path}: {err.error}')
+        for page, chart in affected:
+            self._guard(f'{page}/{chart.chart_id}', figures.get, page, chart.chart_id,
+                        source_version(chart.sources, *chart.extra), chart.build)
+
+    def touch(self):
+        """Record a view of the store. Returns False if the watcher has
+        already stopped, in which case a new one is needed."""
+        with self._state_lock:
+            if self._stopped:
+                return False
+            self._last_used = time.monotonic()
+            return True
+
+    def _idle(self):
+        with self._state_lock:
+            if self.idle_timeout > 0 and time.monotonic() - self._last_used > self.idle_timeout:
+                self._stopped = True
+            return self._stopped
+
+    def _run(self):
+        self._guard('poll', self.poll)
+        while not self._stop.wait(self.interval) and not self._idle():
+            self._guard('poll', self.poll)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='dashboard-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        with self._state_lock:
+            self._stopped = True
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self):
+        return {'polls': self.polls, 'changes': self.changes, 'errors': list(self.errors)}
+
+
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+
+def start_watcher(base_path):
+    """Process-wide running watcher for base_path, or None when
+    DASHBOARD_WATCH_INTERVAL is 0. Called on every view of the store; a
+    watcher that went idle is replaced by a new one."""
+    if WATCH_INTERVAL <= 0:
+        return None
+    base_path = os.path.abspath(base_path)
+    with _watchers_lock:
+        watcher = _watchers.get(base_path)
+        if watcher is None or not watcher.touch():
+            watcher = _watchers[base_path] = FileWatcher(base_path).start()
+        return watcher